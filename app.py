@@ -7,6 +7,24 @@ import mlflow
 import mlflow.sklearn
 import numpy as np
 import os
+import atexit
+import hmac
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from urllib.parse import urlparse
+from urllib.request import url2pathname
+from mlflow.exceptions import MlflowException
+from model_selection import select_best_run, LATENCY_SLO_MS, F1_TOLERANCE
+from run_store import RunStore, ensure_synced
+from quantization import load_quantized_model
+from mmap_artifact import load_mmap_model
+from profiler import SamplingProfiler, install_signal_handler
+from drift_monitor import DriftMonitor
+from prediction_log import PredictionLogSink
+from cascade import ModelCascade
 
 app = Flask(__name__)
 
@@ -14,26 +32,318 @@ app = Flask(__name__)
 MODEL_NAME = "BestClassifier"
 MODEL_STAGE = "Production"
 
-# Try to load the model
-try:
-    model_uri = f"models:/{MODEL_NAME}/{MODEL_STAGE}"
-    model = mlflow.sklearn.load_model(model_uri)
-    print(f"Model loaded successfully from Model Registry: {model_uri}")
-except Exception as e:
-    print(f"Could not load from Model Registry: {e}")
-    print("Attempting to load latest model from runs...")
+# Serve the compact quantized artifact when the run approved one
+USE_QUANTIZED_MODEL = os.environ.get("USE_QUANTIZED_MODEL", "").lower() in ("1", "true", "yes")
+
+# 'pickle' unpickles a private copy per process; 'mmap' maps the mmap_model
+# artifact so processes on a host share one page-cache copy
+MODEL_FORMAT = os.environ.get("MODEL_FORMAT", "pickle")
+MMAP_CACHE_DIR = os.environ.get("MMAP_CACHE_DIR", os.path.join(tempfile.gettempdir(), "mlops-mmap-cache"))
+
+# Admin endpoints are disabled unless a token is configured
+ADMIN_TOKEN = os.environ.get("ADMIN_TOKEN")
+
+# On-demand profiling: bounded windows written as folded stacks to PROFILE_DIR
+PROFILE_DIR = os.environ.get("PROFILE_DIR", "profiles")
+PROFILE_SECONDS = float(os.environ.get("PROFILE_SECONDS", 30))
+PROFILE_MAX_SECONDS = float(os.environ.get("PROFILE_MAX_SECONDS", 300))
+# Shorter sampling intervals would let the sampler thread monopolize the GIL
+PROFILE_MIN_INTERVAL_MS = float(os.environ.get("PROFILE_MIN_INTERVAL_MS", 1))
+
+# JSON-lines audit log of predictions; set to an empty string to disable
+PREDICTION_LOG_PATH = os.environ.get("PREDICTION_LOG_PATH", os.path.join("logs", "predictions.jsonl"))
+
+# Serve the calibrated two-stage cascade (cheap model first, expensive model for
+# low-confidence rows) instead of the single selected model
+CASCADE_ENABLED = os.environ.get("CASCADE_ENABLED", "").lower() in ("1", "true", "yes")
+CASCADE_RUN_NAME = os.environ.get("CASCADE_RUN_NAME", "Cascade_Calibration")
+# The cascade is only enabled when calibration measured a single-row latency
+# saving; force it for batch-heavy traffic where only the batch saving matters
+CASCADE_FORCE = os.environ.get("CASCADE_FORCE", "").lower() in ("1", "true", "yes")
+
+# Load the model in a background thread at import; disable to load on demand
+LOAD_MODEL_ON_STARTUP = os.environ.get("LOAD_MODEL_ON_STARTUP", "true").lower() in ("1", "true", "yes")
+
+# Synthetic warm-up run after loading, before the app reports ready
+WARMUP_BATCHES = int(os.environ.get("WARMUP_BATCHES", 5))
+WARMUP_BATCH_SIZE = int(os.environ.get("WARMUP_BATCH_SIZE", 32))
+
+
+def load_approved_quantized_model(run_id):
+    """
+    Load the quantized artifact of a run if it passed the accuracy tolerance, else None.
+    """
+    run = mlflow.get_run(run_id)
+    if run.data.tags.get("quantization_approved") != "true":
+        print(f"No approved quantized artifact for run {run_id}, serving full-precision model")
+        return None
+    local_path = mlflow.artifacts.download_artifacts(
+        run_id=run_id, artifact_path="quantized_model/quantized_model.npz"
+    )
+    print(f"Quantized model loaded from run: {run_id}")
+    return load_quantized_model(local_path)
+
+
+def load_reference_stats(run_id):
+    """
+    Load the training-data reference statistics logged with a run, or None.
+    """
     try:
+        return mlflow.artifacts.load_dict(f"runs:/{run_id}/reference_stats.json")
+    except Exception as e:
+        print(f"No reference statistics for run {run_id}, drift comparison disabled: {e}")
+        return None
+
+
+def resolve_model_run():
+    """
+    Find the model to serve: the Production model in the Model Registry,
+    falling back to the best run.
+    
+    Returns:
+        (model_uri, run_id)
+    """
+    try:
+        model_uri = f"models:/{MODEL_NAME}/{MODEL_STAGE}"
+        run_id = mlflow.models.get_model_info(model_uri).run_id
+        print(f"Serving model from Model Registry: {model_uri}")
+    except Exception as e:
+        print(f"Could not load from Model Registry: {e}")
+        print("Attempting to load latest model from runs...")
         # Fallback: Load the latest model from runs
-        experiment = mlflow.get_experiment_by_name("Classification_Experiments")
-        runs = mlflow.search_runs(experiment_ids=[experiment.experiment_id])
-        runs = runs.sort_values('metrics.test_f1_score', ascending=False)
-        best_run_id = runs.iloc[0]['run_id']
-        model_uri = f"runs:/{best_run_id}/model"
-        model = mlflow.sklearn.load_model(model_uri)
-        print(f"Model loaded from run: {best_run_id}")
-    except Exception as e2:
-        print(f"Error loading model: {e2}")
-        model = None
+        store = RunStore()
+        experiment_id = ensure_synced(store)
+        runs = store.selection_candidates(experiment_id, LATENCY_SLO_MS, F1_TOLERANCE)
+        run_id = select_best_run(runs)['run_id']
+        model_uri = f"runs:/{run_id}/model"
+    return model_uri, run_id
+
+
+def mmap_artifact_dir(run_id):
+    """
+    Return a local directory holding the run's mmap_model artifact.
+    
+    Local artifact stores are mapped in place; remote artifacts are downloaded
+    once per host into MMAP_CACHE_DIR so all workers map the same files.
+    """
+    artifact_uri = mlflow.get_run(run_id).info.artifact_uri
+    parsed = urlparse(artifact_uri)
+    if parsed.scheme in ("", "file"):
+        return os.path.join(url2pathname(parsed.path), "mmap_model")
+    
+    cached_dir = os.path.join(MMAP_CACHE_DIR, run_id, "mmap_model")
+    if not os.path.exists(cached_dir):
+        os.makedirs(os.path.dirname(cached_dir), exist_ok=True)
+        download_dir = tempfile.mkdtemp(dir=os.path.dirname(cached_dir))
+        try:
+            mlflow.artifacts.download_artifacts(run_id=run_id, artifact_path="mmap_model",
+                                                dst_path=download_dir)
+            try:
+                # Atomic publish; another worker may have won the race
+                os.rename(os.path.join(download_dir, "mmap_model"), cached_dir)
+            except OSError:
+                pass
+        finally:
+            shutil.rmtree(download_dir, ignore_errors=True)
+    return cached_dir
+
+
+def load_model():
+    """
+    Load the model to serve in the configured artifact format.
+    
+    Returns:
+        (model, run_id)
+    """
+    model_uri, run_id = resolve_model_run()
+    
+    loaded = None
+    if USE_QUANTIZED_MODEL:
+        loaded = load_approved_quantized_model(run_id)
+    if loaded is None and MODEL_FORMAT == "mmap":
+        try:
+            loaded = load_mmap_model(mmap_artifact_dir(run_id))
+            print(f"Memory-mapped model loaded from run: {run_id}")
+        except (OSError, MlflowException) as e:
+            print(f"No mmap artifact for run {run_id}, falling back to pickle: {e}")
+    if loaded is None:
+        loaded = mlflow.sklearn.load_model(model_uri)
+        print(f"Model loaded from: {model_uri}")
+    return loaded, run_id
+
+
+def load_cascade():
+    """
+    Load both stages and the threshold of the latest cascade calibration run.
+    
+    Returns:
+        (cascade, second_stage_run_id, calibration_metrics); cascade is None when
+        calibration did not measure a single-row latency saving and CASCADE_FORCE is off
+    """
+    store = RunStore()
+    experiment_id = ensure_synced(store)
+    calibration_run = store.run_by_name(experiment_id, CASCADE_RUN_NAME)
+    if calibration_run is None:
+        raise RuntimeError(f"No '{CASCADE_RUN_NAME}' run found. Please run experiments first.")
+    
+    run = mlflow.get_run(calibration_run['run_id'])
+    params = run.data.params
+    saving = run.data.metrics.get('single_row_latency_saved_pct')
+    if saving is None or saving <= 0:
+        print(f"Warning: cascade calibration run {run.info.run_id} measured no single-row "
+              f"latency saving ({saving}); the cascade would make /predict slower")
+        if not CASCADE_FORCE:
+            print("Cascade disabled, serving the selected model. Set CASCADE_FORCE=true to override.")
+            return None, params['second_stage_run_id'], run.data.metrics
+    first_stage = mlflow.sklearn.load_model(f"runs:/{params['first_stage_run_id']}/model")
+    second_stage = mlflow.sklearn.load_model(f"runs:/{params['second_stage_run_id']}/model")
+    print(f"Cascade loaded from run {run.info.run_id} (threshold {params['threshold']})")
+    return (ModelCascade(first_stage, second_stage, float(params['threshold'])),
+            params['second_stage_run_id'], run.data.metrics)
+
+
+def model_n_features(loaded):
+    """
+    Number of input features of a loaded model, defaulting to the generated data's 20.
+    """
+    return int(getattr(loaded, "n_features_in_", 20))
+
+
+def warm_up(loaded):
+    """
+    Run synthetic single-row and batch predictions so the first real request
+    does not pay for lazy initialization.
+    """
+    n_features = model_n_features(loaded)
+    rng = np.random.default_rng(0)
+    for _ in range(WARMUP_BATCHES):
+        for X in (rng.standard_normal((1, n_features)),
+                  rng.standard_normal((WARMUP_BATCH_SIZE, n_features))):
+            loaded.predict(X)
+            try:
+                loaded.predict_proba(X)
+            except AttributeError:
+                pass
+
+
+def load_model_in_background():
+    """
+    Load and warm up the model, then publish it for serving.
+    """
+    global model, drift_monitor
+    try:
+        start = time.perf_counter()
+        loaded = None
+        if CASCADE_ENABLED:
+            loaded, run_id, model_state['cascade_calibration'] = load_cascade()
+        if loaded is None:
+            loaded, run_id = load_model()
+        model_state['run_id'] = run_id
+        model_state['load_duration_ms'] = (time.perf_counter() - start) * 1000
+        
+        model_state['status'] = 'warming_up'
+        start = time.perf_counter()
+        warm_up(loaded)
+        model_state['warmup_duration_ms'] = (time.perf_counter() - start) * 1000
+        
+        # Monitor and cascade counters start after warm-up so synthetic batches are not counted as traffic
+        monitor = DriftMonitor(model_n_features(loaded), loaded.classes_,
+                               reference=load_reference_stats(run_id))
+        if isinstance(loaded, ModelCascade):
+            loaded.reset()
+    except Exception as e:
+        print(f"Error loading model: {e}")
+        model_state['status'] = 'failed'
+        model_state['error'] = str(e)
+        return
+    
+    drift_monitor = monitor
+    # Only publish a warm model, so readiness implies steady-state latency
+    model = loaded
+    model_state['status'] = 'ready'
+    print(f"Model ready (load {model_state['load_duration_ms']:.0f} ms, "
+          f"warm-up {model_state['warmup_duration_ms']:.0f} ms)")
+
+
+# Load the model in the background so the server binds immediately
+model = None
+drift_monitor = None
+model_state = {
+    'status': 'loading',  # loading -> warming_up -> ready | failed
+    'run_id': None,
+    'error': None,
+    'load_duration_ms': None,
+    'warmup_duration_ms': None,
+    'cascade_calibration': None,
+}
+model_loader = None
+if LOAD_MODEL_ON_STARTUP:
+    model_loader = threading.Thread(target=load_model_in_background, name="model-loader", daemon=True)
+    model_loader.start()
+
+
+# Idle until started by /admin/profile or SIGUSR1
+profiler = SamplingProfiler()
+install_signal_handler(profiler, PROFILE_SECONDS, output_dir=PROFILE_DIR)
+
+
+def admin_forbidden():
+    """
+    Return an error response unless the request carries the admin token, else None.
+    """
+    if not ADMIN_TOKEN:
+        return jsonify({'error': 'Admin endpoints are disabled. Set ADMIN_TOKEN to enable them.'}), 403
+    # Constant-time comparison so the token cannot be recovered from response timing
+    if not hmac.compare_digest(request.headers.get('X-Admin-Token', '').encode(), ADMIN_TOKEN.encode()):
+        return jsonify({'error': 'Invalid admin token'}), 403
+    return None
+
+
+# Audit log of every /predict call, written off the request path
+prediction_log = None
+if PREDICTION_LOG_PATH:
+    prediction_log = PredictionLogSink(
+        PREDICTION_LOG_PATH,
+        max_queue_size=int(os.environ.get("PREDICTION_LOG_QUEUE_SIZE", 10000)),
+        max_bytes=int(os.environ.get("PREDICTION_LOG_MAX_BYTES", 100 * 1024 * 1024)),
+        rotate_interval=float(os.environ.get("PREDICTION_LOG_ROTATE_SECONDS", 24 * 3600)),
+        compress=os.environ.get("PREDICTION_LOG_COMPRESS", "").lower() in ("1", "true", "yes"),
+        on_full=os.environ.get("PREDICTION_LOG_ON_FULL", "drop"),
+        block_timeout=float(os.environ.get("PREDICTION_LOG_BLOCK_TIMEOUT", 5)),
+    )
+    atexit.register(prediction_log.close)
+
+
+def log_prediction(start, status_code, features, result=None, error=None):
+    """
+    Queue an audit record for one /predict call.
+    """
+    if prediction_log is None:
+        return
+    prediction_log.write({
+        'timestamp': time.time(),
+        'request_id': uuid.uuid4().hex,
+        'model_run_id': model_state['run_id'],
+        'status_code': status_code,
+        'latency_ms': (time.perf_counter() - start) * 1000,
+        'features': features,
+        'prediction': result.get('prediction', result.get('predictions')) if result else None,
+        'probabilities': result.get('probabilities') if result else None,
+        'error': error,
+    })
+
+
+def model_unavailable():
+    """
+    Error response for requests that arrive before a model is ready.
+    """
+    if model_state['status'] == 'failed':
+        return jsonify({
+            'error': 'Model not loaded. Please run experiments first.'
+        }), 500
+    return jsonify({
+        'error': f"Model is not ready yet ({model_state['status']}). Please retry shortly."
+    }), 503
 
 
 @app.route('/')
@@ -48,12 +358,18 @@ def home():
 def predict():
     """
     Predict endpoint for classification.
+    
+    'features' is one row, or a list of rows to predict as one batch.
     """
+    start = time.perf_counter()
     if model is None:
-        return jsonify({
-            'error': 'Model not loaded. Please run experiments first.'
-        }), 500
+        response, status_code = model_unavailable()
+        raw_features = (request.get_json(silent=True) or {}).get('features') if request.is_json \
+            else request.form.get('features')
+        log_prediction(start, status_code, raw_features, error=response.get_json()['error'])
+        return response, status_code
     
+    features = None
     try:
         # Get input data from form
         if request.is_json:
@@ -66,38 +382,82 @@ def predict():
         
         # Validate input
         if not features:
+            log_prediction(start, 400, features, error='No features provided')
             return jsonify({'error': 'No features provided'}), 400
         
-        # Convert to numpy array and reshape
-        X = np.array(features).reshape(1, -1)
+        # Convert to numpy array; a list of rows is predicted as one batch
+        X = np.array(features, dtype=float)
+        is_batch = X.ndim == 2
+        if X.ndim > 2:
+            raise ValueError("features must be one row or a list of rows")
+        X = X.reshape(len(X) if is_batch else 1, -1)
         
         # Make prediction
-        prediction = model.predict(X)[0]
-        
-        # Get prediction probabilities if available
-        try:
-            probabilities = model.predict_proba(X)[0]
-            prob_dict = {f"Class {i}": float(prob) for i, prob in enumerate(probabilities)}
-        except:
-            prob_dict = None
+        escalated = None
+        if isinstance(model, ModelCascade):
+            # One pass through the cascade yields both predictions and probabilities;
+            # only the uncertain rows of the batch reach the second stage
+            predictions, probabilities, escalated = model.predict_with_proba(X)
+            prob_dicts = [None if np.isnan(row).any() else row for row in probabilities]
+        else:
+            predictions = model.predict(X)
+            
+            # Get prediction probabilities if available
+            try:
+                prob_dicts = list(model.predict_proba(X))
+            except:
+                prob_dicts = [None] * len(X)
+        prob_dicts = [
+            None if row is None else {f"Class {i}": float(prob) for i, prob in enumerate(row)}
+            for row in prob_dicts
+        ]
+        drift_monitor.update(X, predictions)
         
         # Prepare response
-        result = {
-            'prediction': int(prediction),
-            'prediction_label': f"Class {prediction}",
-            'input_features': features,
-            'num_features': len(features)
-        }
-        
-        if prob_dict:
-            result['probabilities'] = prob_dict
+        if is_batch:
+            result = {
+                'predictions': [int(p) for p in predictions],
+                'probabilities': prob_dicts,
+                'num_rows': len(X),
+                'num_features': X.shape[1]
+            }
+            if escalated is not None:
+                result['escalated'] = escalated.tolist()
+        else:
+            prediction = predictions[0]
+            result = {
+                'prediction': int(prediction),
+                'prediction_label': f"Class {prediction}",
+                'input_features': features,
+                'num_features': len(features)
+            }
+            
+            if prob_dicts[0]:
+                result['probabilities'] = prob_dicts[0]
+            if escalated is not None:
+                result['escalated'] = bool(escalated[0])
         
+        log_prediction(start, 200, features, result)
         return jsonify(result)
     
     except ValueError as e:
-        return jsonify({'error': f'Invalid input format: {str(e)}'}), 400
+        error = f'Invalid input format: {str(e)}'
+        log_prediction(start, 400, features, error=error)
+        return jsonify({'error': error}), 400
     except Exception as e:
-        return jsonify({'error': f'Prediction error: {str(e)}'}), 500
+        error = f'Prediction error: {str(e)}'
+        log_prediction(start, 500, features, error=error)
+        return jsonify({'error': error}), 500
+
+
+@app.route('/prediction-log/stats')
+def prediction_log_stats():
+    """
+    Counters of the prediction audit log sink.
+    """
+    if prediction_log is None:
+        return jsonify({'enabled': False})
+    return jsonify({'enabled': True, **prediction_log.stats()})
 
 
 @app.route('/info')
@@ -106,9 +466,7 @@ def model_info():
     Get information about the loaded model.
     """
     if model is None:
-        return jsonify({
-            'error': 'Model not loaded. Please run experiments first.'
-        }), 500
+        return model_unavailable()
     
     info = {
         'model_type': type(model).__name__,
@@ -126,16 +484,124 @@ def model_info():
     return jsonify(info)
 
 
+@app.route('/drift')
+def drift():
+    """
+    Live feature and prediction statistics compared against the training reference.
+    """
+    if drift_monitor is None:
+        return model_unavailable()
+    return jsonify(drift_monitor.report())
+
+
+@app.route('/cascade')
+def cascade_stats():
+    """
+    Live escalation rate and estimated latency saved by the cascade, next to
+    the offline calibration results.
+    """
+    if not CASCADE_ENABLED:
+        return jsonify({'enabled': False})
+    if model is None:
+        return model_unavailable()
+    if not isinstance(model, ModelCascade):
+        return jsonify({
+            'enabled': False,
+            'reason': 'Calibration measured no single-row latency saving; set CASCADE_FORCE=true to override',
+            'calibration': model_state['cascade_calibration'],
+        })
+    return jsonify({
+        'enabled': True,
+        'live': model.stats(),
+        'calibration': model_state['cascade_calibration'],
+    })
+
+
+@app.route('/admin/profile', methods=['POST'])
+def start_profile():
+    """
+    Start a bounded sampling-profiler window.
+    
+    Query parameters: seconds (default PROFILE_SECONDS, at most PROFILE_MAX_SECONDS),
+    interval_ms (default 5, at least PROFILE_MIN_INTERVAL_MS).
+    """
+    forbidden = admin_forbidden()
+    if forbidden:
+        return forbidden
+    
+    try:
+        seconds = float(request.args.get('seconds', PROFILE_SECONDS))
+        interval_ms = float(request.args.get('interval_ms', 5))
+    except ValueError as e:
+        return jsonify({'error': f'Invalid profiling parameters: {str(e)}'}), 400
+    if seconds <= 0 or interval_ms <= 0:
+        return jsonify({'error': 'seconds and interval_ms must be positive'}), 400
+    seconds = min(seconds, PROFILE_MAX_SECONDS)
+    interval = max(interval_ms, PROFILE_MIN_INTERVAL_MS) / 1000
+    
+    output_path = os.path.join(PROFILE_DIR, f"profile_{int(time.time())}.folded")
+    if not profiler.start(duration=seconds, interval=interval, output_path=output_path):
+        return jsonify({'error': 'Profiler is already running'}), 409
+    
+    return jsonify({
+        'status': 'profiling',
+        'seconds': seconds,
+        'interval_ms': interval * 1000,
+        'output_path': output_path
+    })
+
+
+@app.route('/admin/profile', methods=['GET'])
+def get_profile():
+    """
+    Return the current or last profile as folded stacks (text/plain).
+    """
+    forbidden = admin_forbidden()
+    if forbidden:
+        return forbidden
+    
+    return app.response_class(profiler.folded(), mimetype='text/plain', headers={
+        'X-Profile-Running': str(profiler.is_running).lower(),
+        'X-Profile-Samples': str(profiler.samples),
+    })
+
+
 @app.route('/health')
 def health():
     """
     Health check endpoint.
     """
     return jsonify({
-        'status': 'healthy',
+        'status': 'healthy' if model_state['status'] == 'ready' else model_state['status'],
         'model_loaded': model is not None
     })
 
 
+@app.route('/health/live')
+def liveness():
+    """
+    Liveness probe: the process is up and serving HTTP.
+    """
+    return jsonify({'status': 'alive'})
+
+
+@app.route('/health/ready')
+def readiness():
+    """
+    Readiness probe: the model is loaded and warmed up.
+    """
+    ready = model_state['status'] == 'ready'
+    return jsonify({
+        'ready': ready,
+        'status': model_state['status'],
+        'run_id': model_state['run_id'],
+        'error': model_state['error'],
+        'load_duration_ms': model_state['load_duration_ms'],
+        'warmup_duration_ms': model_state['warmup_duration_ms'],
+        'warmup_batches': WARMUP_BATCHES,
+        'warmup_batch_size': WARMUP_BATCH_SIZE,
+    }), 200 if ready else 503
+
+
 if __name__ == '__main__':
     app.run(debug=True, host='0.0.0.0', port=5001)
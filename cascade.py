@@ -0,0 +1,181 @@
+"""
+Confidence-gated two-stage model cascade.
+A cheap first-stage model answers the rows it is confident about; only the
+remaining rows of a batch are sent to the expensive second-stage model.
+"""
+
+import threading
+import time
+import numpy as np
+
+
+def calibrate_threshold(first_proba, first_correct, second_correct, target_accuracy):
+    """
+    Find the lowest confidence threshold whose cascade accuracy meets the target.
+
+    Rows whose top first-stage probability is below the threshold are escalated.
+    If no threshold reaches the target, the most accurate one is returned.
+
+    Args:
+        first_proba: First-stage predict_proba output on the calibration set
+        first_correct: Boolean array, first-stage prediction is correct
+        second_correct: Boolean array, second-stage prediction is correct
+        target_accuracy: Required cascade accuracy
+
+    Returns:
+        dict with threshold, accuracy and escalation_fraction on the calibration set
+    """
+    confidence = first_proba.max(axis=1)
+    order = np.argsort(confidence)
+    sorted_confidence = confidence[order]
+    n_rows = len(confidence)
+
+    # Escalating the k least confident rows: second stage answers those, first the rest
+    second_cumulative = np.concatenate([[0], np.cumsum(second_correct[order])])
+    first_cumulative = np.concatenate([[0], np.cumsum(first_correct[order])])
+    accuracy_by_k = (second_cumulative + first_cumulative[-1] - first_cumulative) / n_rows
+
+    # Only thresholds that fall between distinct confidence values are achievable
+    thresholds = np.append(np.unique(sorted_confidence), np.inf)
+    k = np.searchsorted(sorted_confidence, thresholds, side="left")
+    accuracy = accuracy_by_k[k]
+
+    meets_target = np.flatnonzero(accuracy >= target_accuracy)
+    best = meets_target[0] if len(meets_target) else int(np.argmax(accuracy))
+    return {
+        'threshold': float(thresholds[best]),
+        'accuracy': float(accuracy[best]),
+        'escalation_fraction': float(k[best] / n_rows),
+        'target_reached': bool(len(meets_target)),
+    }
+
+
+class ModelCascade:
+    """
+    Serve a cheap model and escalate low-confidence rows to an expensive one.
+
+    Args:
+        first_stage: Fitted model with predict_proba
+        second_stage: Fitted model with predict (predict_proba optional)
+        threshold: Rows with top first-stage probability below this are escalated
+    """
+
+    def __init__(self, first_stage, second_stage, threshold):
+        self.first_stage = first_stage
+        self.second_stage = second_stage
+        self.threshold = threshold
+        self.classes_ = first_stage.classes_
+        self.n_features_in_ = first_stage.n_features_in_
+
+        self.n_rows = 0
+        self.n_escalated = 0
+        self.first_stage_seconds = 0.0
+        self.second_stage_seconds = 0.0
+        self._lock = threading.Lock()
+
+        # sklearn's input validation costs ~10x the arithmetic of a linear model on
+        # one row; compute linear probabilities directly when that reproduces predict_proba
+        self.fast_first_stage = self._linear_fast_path_matches()
+
+    def _linear_proba(self, X):
+        """
+        Multinomial / binary logistic probabilities straight from coef_ and intercept_.
+        """
+        scores = X @ self.first_stage.coef_.T + self.first_stage.intercept_
+        if scores.shape[1] == 1:
+            positive = 1 / (1 + np.exp(-scores))
+            return np.hstack([1 - positive, positive])
+        exp_scores = np.exp(scores - scores.max(axis=1, keepdims=True))
+        return exp_scores / exp_scores.sum(axis=1, keepdims=True)
+
+    def _linear_fast_path_matches(self):
+        """
+        Check the direct computation against predict_proba on a random probe batch;
+        one-vs-rest and non-linear first stages do not match and keep the sklearn path.
+        """
+        if not (hasattr(self.first_stage, "coef_") and hasattr(self.first_stage, "intercept_")):
+            return False
+        probe = np.random.default_rng(0).standard_normal((32, self.n_features_in_))
+        try:
+            return bool(np.allclose(self._linear_proba(probe), self.first_stage.predict_proba(probe)))
+        except (ValueError, AttributeError):
+            return False
+
+    def predict_with_proba(self, X):
+        """
+        Run the cascade once: each stage is called at most once per batch.
+
+        Rows escalated to a second stage without predict_proba get NaN
+        probabilities rather than a made-up certainty.
+
+        Returns:
+            (predictions, proba, escalated mask)
+        """
+        X = np.asarray(X, dtype=float)
+        start = time.perf_counter()
+        if self.fast_first_stage:
+            proba = self._linear_proba(X)
+        else:
+            proba = self.first_stage.predict_proba(X)
+        escalated = proba.max(axis=1) < self.threshold
+        first_seconds = time.perf_counter() - start
+
+        second_seconds = 0.0
+        second_predictions = None
+        if escalated.any():
+            start = time.perf_counter()
+            # Skip the copy when the whole batch (e.g. a single row) is escalated
+            X_escalated = X if escalated.all() else X[escalated]
+            if hasattr(self.second_stage, "predict_proba"):
+                proba[escalated] = self.second_stage.predict_proba(X_escalated)
+            else:
+                second_predictions = self.second_stage.predict(X_escalated)
+            second_seconds = time.perf_counter() - start
+
+        predictions = self.classes_[proba.argmax(axis=1)]
+        if second_predictions is not None:
+            predictions[escalated] = second_predictions
+            proba[escalated] = np.nan
+
+        with self._lock:
+            self.n_rows += len(X)
+            self.n_escalated += int(escalated.sum())
+            self.first_stage_seconds += first_seconds
+            self.second_stage_seconds += second_seconds
+        return predictions, proba, escalated
+
+    def predict(self, X):
+        return self.predict_with_proba(X)[0]
+
+    def predict_proba(self, X):
+        return self.predict_with_proba(X)[1]
+
+    def reset(self):
+        """
+        Zero the routing counters, e.g. after warm-up traffic.
+        """
+        with self._lock:
+            self.n_rows = 0
+            self.n_escalated = 0
+            self.first_stage_seconds = 0.0
+            self.second_stage_seconds = 0.0
+
+    def stats(self):
+        """
+        Live routing counters and the estimated latency saved versus the second stage alone.
+        """
+        with self._lock:
+            stats = {
+                'threshold': self.threshold,
+                'rows': self.n_rows,
+                'escalated_rows': self.n_escalated,
+                'escalated_fraction': self.n_escalated / self.n_rows if self.n_rows else None,
+                'first_stage_ms': self.first_stage_seconds * 1000,
+                'second_stage_ms': self.second_stage_seconds * 1000,
+            }
+            if self.n_escalated:
+                # Cost of sending every row to the second stage, at its observed per-row cost
+                second_only_seconds = self.second_stage_seconds / self.n_escalated * self.n_rows
+                cascade_seconds = self.first_stage_seconds + self.second_stage_seconds
+                stats['estimated_latency_saved_ms'] = (second_only_seconds - cascade_seconds) * 1000
+        return stats
@@ -8,6 +8,7 @@ from sklearn.datasets import make_classification, fetch_openml
 from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import StandardScaler
 import pandas as pd
+from drift_monitor import StreamingFeatureStats
 
 
 def generate_synthetic_data(n_samples=1000, n_features=20, n_informative=15, 
@@ -85,6 +86,39 @@ def load_mnist_data(subset_size=None, random_state=42):
     return X_train_scaled, X_test_scaled, y_train, y_test, scaler
 
 
+def compute_reference_stats(X_train, y_train, scaler, n_bins=10):
+    """
+    Capture training-data statistics that live traffic is compared against.
+    
+    Args:
+        X_train: Scaled training features, as fed to the models
+        y_train: Training labels
+        scaler: The fitted StandardScaler
+        n_bins: Number of quantile bins per feature
+    
+    Returns:
+        JSON-serializable dict of reference statistics
+    """
+    # Quantile bin edges so each bin holds ~1/n_bins of the training rows
+    bin_edges = np.quantile(X_train, np.linspace(0, 1, n_bins + 1), axis=0).T
+    stats = StreamingFeatureStats(X_train.shape[1], bin_edges)
+    stats.update(X_train)
+    
+    return {
+        "n_samples": int(X_train.shape[0]),
+        "n_features": int(X_train.shape[1]),
+        "scaler_mean": scaler.mean_.tolist(),
+        "scaler_scale": scaler.scale_.tolist(),
+        "mean": stats.mean.tolist(),
+        "std": np.sqrt(stats.variance).tolist(),
+        "min": stats.min.tolist(),
+        "max": stats.max.tolist(),
+        "bin_edges": bin_edges.tolist(),
+        "bin_fractions": stats.bin_fractions().tolist(),
+        "class_distribution": (np.bincount(y_train) / len(y_train)).tolist(),
+    }
+
+
 def get_data_info(X_train, X_test, y_train, y_test):
     """
     Print information about the dataset.
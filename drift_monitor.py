@@ -0,0 +1,183 @@
+"""
+Constant-memory streaming statistics for live prediction traffic.
+Tracks per-feature Welford mean/variance, min/max and a fixed-bin quantile
+histogram plus a per-class prediction histogram, and compares them against
+reference statistics captured from the training data.
+"""
+
+import threading
+import numpy as np
+
+# Bin edges used when no reference is available; inputs are standardized features
+DEFAULT_BIN_EDGES = np.linspace(-4, 4, 17)
+
+# Population stability index above which a feature is reported as drifted
+PSI_DRIFT_THRESHOLD = 0.2
+
+# PSI is noisy on small samples; no feature is flagged below this many rows
+MIN_DRIFT_SAMPLES = 500
+
+REPORTED_QUANTILES = (0.05, 0.25, 0.5, 0.75, 0.95)
+
+
+def population_stability_index(expected, actual, eps=1e-6):
+    """
+    PSI between two sets of bin fractions; computed along the last axis.
+    """
+    expected = np.clip(expected, eps, None)
+    actual = np.clip(actual, eps, None)
+    return np.sum((actual - expected) * np.log(actual / expected), axis=-1)
+
+
+class StreamingFeatureStats:
+    """
+    Per-feature running statistics updated one batch at a time.
+
+    Memory is O(n_features * n_bins) regardless of how many rows are seen.
+    """
+
+    def __init__(self, n_features, bin_edges=None):
+        if bin_edges is None:
+            bin_edges = np.tile(DEFAULT_BIN_EDGES, (n_features, 1))
+        # Outer edges are open-ended: values beyond them fall in the first/last bin
+        self.bin_edges = np.asarray(bin_edges, dtype=float)
+        if self.bin_edges.ndim != 2 or self.bin_edges.shape[0] != n_features:
+            raise ValueError(f"bin_edges has shape {self.bin_edges.shape}, "
+                             f"expected one row of edges for each of {n_features} features")
+        self.n_features = n_features
+        self.n_bins = self.bin_edges.shape[1] - 1
+
+        self.count = 0
+        self.mean = np.zeros(n_features)
+        self.m2 = np.zeros(n_features)
+        self.min = np.full(n_features, np.inf)
+        self.max = np.full(n_features, -np.inf)
+        self.bin_counts = np.zeros((n_features, self.n_bins), dtype=np.int64)
+
+    def update(self, X):
+        """
+        Merge a batch of rows into the running statistics (Chan et al. parallel Welford).
+        """
+        X = np.asarray(X, dtype=float).reshape(-1, self.n_features)
+        n_batch = len(X)
+        if n_batch == 0:
+            return
+
+        batch_mean = X.mean(axis=0)
+        batch_m2 = ((X - batch_mean) ** 2).sum(axis=0)
+        total = self.count + n_batch
+        delta = batch_mean - self.mean
+        self.mean += delta * n_batch / total
+        self.m2 += batch_m2 + delta ** 2 * self.count * n_batch / total
+        self.count = total
+
+        self.min = np.minimum(self.min, X.min(axis=0))
+        self.max = np.maximum(self.max, X.max(axis=0))
+
+        # Bin index per cell from the inner edges, then one bincount over all features
+        inner_edges = self.bin_edges[:, 1:-1]
+        bins = (X[:, :, None] >= inner_edges[None, :, :]).sum(axis=2)
+        flat = bins + np.arange(self.n_features) * self.n_bins
+        self.bin_counts += np.bincount(flat.ravel(), minlength=self.n_features * self.n_bins) \
+            .reshape(self.n_features, self.n_bins)
+
+    @property
+    def variance(self):
+        return self.m2 / self.count if self.count else np.zeros(self.n_features)
+
+    def bin_fractions(self):
+        return self.bin_counts / max(self.count, 1)
+
+    def quantiles(self, qs=REPORTED_QUANTILES):
+        """
+        Approximate per-feature quantiles by interpolating within histogram bins.
+
+        Returns:
+            Array of shape (len(qs), n_features)
+        """
+        if self.count == 0:
+            return np.full((len(qs), self.n_features), np.nan)
+        # Clamp the open-ended outer bins to the observed range
+        edges = self.bin_edges.copy()
+        edges[:, 0] = np.minimum(edges[:, 0], self.min)
+        edges[:, -1] = np.maximum(edges[:, -1], self.max)
+        cumulative = np.concatenate(
+            [np.zeros((self.n_features, 1)), np.cumsum(self.bin_counts, axis=1)], axis=1
+        ) / self.count
+        return np.array([
+            [np.interp(q, cumulative[j], edges[j]) for j in range(self.n_features)]
+            for q in qs
+        ])
+
+
+class DriftMonitor:
+    """
+    Thread-safe live-traffic statistics with comparison against a training reference.
+    """
+
+    def __init__(self, n_features, classes, reference=None):
+        self.classes = np.asarray(classes)
+        self.reference = reference
+        bin_edges = reference["bin_edges"] if reference else None
+        self.features = StreamingFeatureStats(n_features, bin_edges)
+        self.prediction_counts = np.zeros(len(self.classes), dtype=np.int64)
+        self._lock = threading.Lock()
+
+    def update(self, X, predictions):
+        """
+        Record a batch of inputs and the model's predictions for them.
+        """
+        class_index = np.searchsorted(self.classes, np.asarray(predictions))
+        counts = np.bincount(class_index, minlength=len(self.classes))
+        with self._lock:
+            self.features.update(X)
+            self.prediction_counts += counts
+
+    def report(self):
+        """
+        Return live statistics and, if a reference is set, drift measures.
+        """
+        with self._lock:
+            stats = self.features
+            count = stats.count
+            live = {
+                'count': count,
+                'mean': stats.mean.tolist(),
+                'std': np.sqrt(stats.variance).tolist(),
+                'min': stats.min.tolist() if count else None,
+                'max': stats.max.tolist() if count else None,
+                'quantiles': {
+                    str(q): values.tolist()
+                    for q, values in zip(REPORTED_QUANTILES, stats.quantiles())
+                } if count else None,
+                'prediction_counts': {
+                    str(c): int(n) for c, n in zip(self.classes, self.prediction_counts)
+                },
+            }
+            bin_fractions = stats.bin_fractions()
+            prediction_fractions = self.prediction_counts / max(self.prediction_counts.sum(), 1)
+            mean = stats.mean.copy()
+            std = np.sqrt(stats.variance)
+
+        report = {'live': live, 'reference_available': self.reference is not None}
+        if self.reference is None or count == 0:
+            return report
+
+        ref_mean = np.asarray(self.reference["mean"])
+        ref_std = np.asarray(self.reference["std"])
+        feature_psi = population_stability_index(np.asarray(self.reference["bin_fractions"]), bin_fractions)
+        prediction_psi = population_stability_index(
+            np.asarray(self.reference["class_distribution"]), prediction_fractions
+        )
+        report['drift'] = {
+            'mean_shift_in_std': ((mean - ref_mean) / ref_std).tolist(),
+            'std_ratio': (std / ref_std).tolist(),
+            'feature_psi': feature_psi.tolist(),
+            'prediction_psi': float(prediction_psi),
+            'psi_threshold': PSI_DRIFT_THRESHOLD,
+            'min_samples': MIN_DRIFT_SAMPLES,
+            'drifted_features': [
+                int(j) for j in np.flatnonzero(feature_psi > PSI_DRIFT_THRESHOLD)
+            ] if count >= MIN_DRIFT_SAMPLES else [],
+        }
+        return report
@@ -0,0 +1,124 @@
+"""
+Memory-mappable model artifact format.
+Large numpy arrays of a fitted model (weights, support vectors, ...) are
+stored as 64-byte aligned raw buffers in one file, and the rest of the model
+is pickled with references to them. Loading memory-maps the buffer file,
+so every process on a host shares one page-cache copy and loading does not
+copy the arrays.
+"""
+
+import io
+import json
+import os
+import pickle
+import numpy as np
+import sklearn
+
+FORMAT_VERSION = 1
+ARRAYS_FILE = "arrays.bin"
+SKELETON_FILE = "model.pkl"
+MANIFEST_FILE = "manifest.json"
+
+ALIGNMENT = 64
+
+# Smaller arrays are cheaper to keep inline in the pickle
+MIN_ARRAY_BYTES = 1024
+
+
+class _ArrayExtractingPickler(pickle.Pickler):
+    """
+    Pickler that writes large arrays to the buffer file and pickles a reference instead.
+    """
+
+    def __init__(self, file, buffer_file, min_array_bytes):
+        super().__init__(file, protocol=pickle.HIGHEST_PROTOCOL)
+        self.buffer_file = buffer_file
+        self.min_array_bytes = min_array_bytes
+        self.n_arrays = 0
+
+    def persistent_id(self, obj):
+        if (type(obj) is not np.ndarray or obj.dtype.hasobject
+                or obj.nbytes < self.min_array_bytes):
+            return None
+
+        # Fortran-ordered arrays are stored transposed and restored as a transposed view
+        transposed = obj.flags.f_contiguous and not obj.flags.c_contiguous
+        data = np.ascontiguousarray(obj.T if transposed else obj)
+
+        offset = self.buffer_file.tell()
+        padding = -offset % ALIGNMENT
+        self.buffer_file.write(b"\0" * padding)
+        offset += padding
+        self.buffer_file.write(data.tobytes())
+        self.n_arrays += 1
+        return ("ndarray", offset, data.dtype.str, data.shape, transposed)
+
+
+class _ArrayMappingUnpickler(pickle.Unpickler):
+    """
+    Unpickler that resolves array references to views of the mapped buffer file.
+    """
+
+    def __init__(self, file, buffer):
+        super().__init__(file)
+        self.buffer = buffer
+
+    def persistent_load(self, pid):
+        kind, offset, dtype, shape, transposed = pid
+        if kind != "ndarray":
+            raise pickle.UnpicklingError(f"Unknown persistent id kind '{kind}'")
+        array = np.ndarray(shape, dtype=np.dtype(dtype), buffer=self.buffer, offset=offset)
+        return array.T if transposed else array
+
+
+def save_mmap_model(model, directory, min_array_bytes=MIN_ARRAY_BYTES):
+    """
+    Save a fitted model in the memory-mappable format.
+
+    Args:
+        model: Any picklable fitted model
+        directory: Output directory (created if needed)
+        min_array_bytes: Arrays at least this large go into the mapped buffer
+    """
+    os.makedirs(directory, exist_ok=True)
+    skeleton = io.BytesIO()
+    with open(os.path.join(directory, ARRAYS_FILE), "wb") as buffer_file:
+        pickler = _ArrayExtractingPickler(skeleton, buffer_file, min_array_bytes)
+        pickler.dump(model)
+        buffer_bytes = buffer_file.tell()
+
+    with open(os.path.join(directory, SKELETON_FILE), "wb") as f:
+        f.write(skeleton.getvalue())
+
+    manifest = {
+        "format_version": FORMAT_VERSION,
+        "model_type": type(model).__name__,
+        "sklearn_version": sklearn.__version__,
+        "n_arrays": pickler.n_arrays,
+        "buffer_bytes": buffer_bytes,
+        "skeleton_bytes": len(skeleton.getvalue()),
+        "alignment": ALIGNMENT,
+    }
+    with open(os.path.join(directory, MANIFEST_FILE), "w") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def load_mmap_model(directory):
+    """
+    Load a model saved with save_mmap_model; its large arrays are memory-mapped views.
+    """
+    with open(os.path.join(directory, MANIFEST_FILE)) as f:
+        manifest = json.load(f)
+    if manifest["format_version"] != FORMAT_VERSION:
+        raise ValueError(f"Unsupported mmap artifact version {manifest['format_version']}")
+
+    buffer = None
+    if manifest["buffer_bytes"] > 0:
+        # Copy-on-write rather than read-only: some libsvm entry points require
+        # writable buffers even though they never write; untouched pages stay
+        # shared in the page cache
+        buffer = np.memmap(os.path.join(directory, ARRAYS_FILE), dtype=np.uint8, mode="c")
+
+    with open(os.path.join(directory, SKELETON_FILE), "rb") as f:
+        return _ArrayMappingUnpickler(f, buffer).load()
@@ -0,0 +1,90 @@
+"""
+Model selection that trades test F1 off against serving cost.
+Works on MLflow run DataFrames as returned by mlflow.search_runs.
+"""
+
+import os
+import numpy as np
+
+F1_METRIC = "metrics.test_f1_score"
+LATENCY_METRIC = "metrics.single_row_latency_ms"
+SIZE_METRIC = "metrics.model_size_bytes"
+
+# Optional single-row latency SLO in milliseconds; unset means no SLO
+LATENCY_SLO_MS = float(os.environ["LATENCY_SLO_MS"]) if os.environ.get("LATENCY_SLO_MS") else None
+
+# Runs within this much F1 of the best are considered equally accurate
+F1_TOLERANCE = float(os.environ.get("F1_TOLERANCE", 0.005))
+
+
+def _cost_columns(runs):
+    """
+    Return (f1, latency, size) arrays, treating missing benchmarks as infinitely costly.
+    """
+    f1 = runs[F1_METRIC].to_numpy(dtype=float)
+    costs = []
+    for column in (LATENCY_METRIC, SIZE_METRIC):
+        if column in runs:
+            costs.append(runs[column].fillna(np.inf).to_numpy(dtype=float))
+        else:
+            costs.append(np.full(len(runs), np.inf))
+    return f1, costs[0], costs[1]
+
+
+def pareto_front(runs):
+    """
+    Return the runs that are not dominated on (higher F1, lower latency, smaller size).
+    """
+    f1, latency, size = _cost_columns(runs)
+    
+    # dominates[i, j] is True when run i is at least as good as run j on every
+    # objective and strictly better on at least one
+    at_least_as_good = (
+        (f1[:, None] >= f1[None, :])
+        & (latency[:, None] <= latency[None, :])
+        & (size[:, None] <= size[None, :])
+    )
+    strictly_better = (
+        (f1[:, None] > f1[None, :])
+        | (latency[:, None] < latency[None, :])
+        | (size[:, None] < size[None, :])
+    )
+    dominated = (at_least_as_good & strictly_better).any(axis=0)
+    
+    return runs[~dominated]
+
+
+def select_best_run(runs, latency_slo_ms=LATENCY_SLO_MS, f1_tolerance=F1_TOLERANCE):
+    """
+    Select the run to promote.
+    
+    Runs over the latency SLO are discarded, then among the Pareto front the
+    cheapest run whose F1 is within f1_tolerance of the best F1 wins.
+    
+    Args:
+        runs: DataFrame of MLflow runs
+        latency_slo_ms: Maximum single-row latency in milliseconds, or None
+        f1_tolerance: F1 difference treated as a tie
+    
+    Returns:
+        The selected row of runs
+    """
+    runs = runs.dropna(subset=[F1_METRIC])
+    if runs.empty:
+        raise ValueError("No runs with a test F1 score to select from")
+    
+    if latency_slo_ms is not None and LATENCY_METRIC in runs:
+        within_slo = runs[runs[LATENCY_METRIC] <= latency_slo_ms]
+        if within_slo.empty:
+            print(f"No run meets the {latency_slo_ms} ms latency SLO, "
+                  "falling back to the fastest run")
+            return runs.sort_values(LATENCY_METRIC).iloc[0]
+        runs = within_slo
+    
+    front = pareto_front(runs)
+    f1, latency, size = _cost_columns(front)
+    near_best = f1 >= f1.max() - f1_tolerance
+    
+    # Cheapest near-best run; ties broken by F1, then size
+    order = np.lexsort((size[near_best], -f1[near_best], latency[near_best]))
+    return front[near_best].iloc[order[0]]
@@ -0,0 +1,201 @@
+"""
+Non-blocking JSON-lines audit log for served predictions.
+Records are put on an in-memory queue and written by a background thread
+in large buffered batches, with size- and time-based rotation and optional
+gzip compression of rotated files.
+"""
+
+import gzip
+import json
+import os
+import queue
+import shutil
+import threading
+import time
+
+ON_FULL_POLICIES = ("drop", "block")
+
+_STOP = object()
+
+
+class PredictionLogSink:
+    """
+    Asynchronous, rotating JSON-lines writer.
+
+    Args:
+        path: Active log file; rotated files get a timestamp suffix
+        max_queue_size: Records buffered in memory before the on_full policy applies
+        batch_size: Maximum records written per batch
+        flush_interval: After the first record of a batch, seconds to keep collecting
+            records before writing a partial batch
+        max_bytes: Rotate once the active file reaches this size (0 = never)
+        rotate_interval: Rotate once the active file is this many seconds old (0 = never)
+        compress: Gzip rotated files
+        on_full: 'drop' discards records when the queue is full, 'block' waits for space
+        block_timeout: Longest 'block' wait in seconds; the record is then dropped,
+            so a dead writer thread cannot hang the callers
+    """
+
+    def __init__(self, path, max_queue_size=10000, batch_size=500, flush_interval=1.0,
+                 max_bytes=100 * 1024 * 1024, rotate_interval=24 * 3600,
+                 compress=False, on_full="drop", block_timeout=5.0):
+        if on_full not in ON_FULL_POLICIES:
+            raise ValueError(f"Unknown on_full policy '{on_full}', expected one of {ON_FULL_POLICIES}")
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_bytes = max_bytes
+        self.rotate_interval = rotate_interval
+        self.compress = compress
+        self.on_full = on_full
+        self.block_timeout = block_timeout
+
+        self.written = 0
+        self.dropped = 0
+        self.rotations = 0
+        self.write_errors = 0
+        self._counter_lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._queue = queue.Queue(maxsize=max_queue_size)
+        self._compressors = []
+        self._file = None
+        self._opened_at = None
+        self._thread = threading.Thread(target=self._run, name="prediction-log-writer", daemon=True)
+        self._thread.start()
+
+    def write(self, record):
+        """
+        Enqueue one record without touching the disk.
+
+        Returns:
+            False if the record was dropped because the queue is full
+        """
+        try:
+            if self.on_full == "block":
+                self._queue.put(record, timeout=self.block_timeout)
+            else:
+                self._queue.put_nowait(record)
+            return True
+        except queue.Full:
+            with self._counter_lock:
+                self.dropped += 1
+            return False
+
+    def close(self, timeout=10):
+        """
+        Flush queued records, stop the writer thread and wait for pending compression.
+        """
+        if self._thread.is_alive():
+            self._queue.put(_STOP)
+            self._thread.join(timeout)
+        for compressor in self._compressors:
+            compressor.join(timeout)
+
+    def stats(self):
+        """
+        Return sink counters.
+        """
+        with self._counter_lock:
+            return {
+                'path': self.path,
+                'written': self.written,
+                'dropped': self.dropped,
+                'queued': self._queue.qsize(),
+                'rotations': self.rotations,
+                'write_errors': self.write_errors,
+                'on_full': self.on_full,
+            }
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            batch = []
+            try:
+                item = self._queue.get(timeout=self.flush_interval)
+                if item is _STOP:
+                    stopping = True
+                else:
+                    batch.append(item)
+                # Keep collecting until the batch is full or flush_interval has passed
+                deadline = time.monotonic() + self.flush_interval
+                while not stopping and len(batch) < self.batch_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    item = self._queue.get(timeout=remaining)
+                    if item is _STOP:
+                        stopping = True
+                    else:
+                        batch.append(item)
+            except queue.Empty:
+                pass
+
+            if batch:
+                self._write_batch(batch)
+            self._maybe_rotate()
+
+        if self._file is not None:
+            self._file.close()
+
+    def _write_batch(self, batch):
+        lines = "".join(json.dumps(record, default=str) + "\n" for record in batch)
+        try:
+            if self._file is None:
+                self._file = open(self.path, "a", buffering=1024 * 1024)
+                self._opened_at = time.time()
+            self._file.write(lines)
+            self._file.flush()
+            with self._counter_lock:
+                self.written += len(batch)
+        except OSError as e:
+            print(f"Prediction log write failed: {e}")
+            with self._counter_lock:
+                self.write_errors += 1
+                self.dropped += len(batch)
+
+    def _maybe_rotate(self):
+        if self._file is None:
+            return
+        too_big = self.max_bytes and self._file.tell() >= self.max_bytes
+        too_old = self.rotate_interval and time.time() - self._opened_at >= self.rotate_interval
+        if not (too_big or too_old):
+            return
+
+        self._file.close()
+        self._file = None
+        rotated_path = f"{self.path}.{time.strftime('%Y%m%d-%H%M%S')}"
+        suffix = 1
+        while os.path.exists(rotated_path) or os.path.exists(rotated_path + ".gz"):
+            rotated_path = f"{self.path}.{time.strftime('%Y%m%d-%H%M%S')}.{suffix}"
+            suffix += 1
+        try:
+            os.replace(self.path, rotated_path)
+            with self._counter_lock:
+                self.rotations += 1
+        except OSError as e:
+            print(f"Prediction log rotation failed: {e}")
+            with self._counter_lock:
+                self.write_errors += 1
+            return
+
+        if self.compress:
+            # Gzipping a large file takes seconds; keep it off the writer thread
+            # so the queue keeps draining
+            self._compressors = [t for t in self._compressors if t.is_alive()]
+            compressor = threading.Thread(target=self._compress, args=(rotated_path,),
+                                          name="prediction-log-compressor", daemon=True)
+            compressor.start()
+            self._compressors.append(compressor)
+
+    def _compress(self, path):
+        try:
+            with open(path, "rb") as src, gzip.open(path + ".gz", "wb") as dst:
+                shutil.copyfileobj(src, dst)
+            os.remove(path)
+        except OSError as e:
+            print(f"Prediction log compression failed: {e}")
+            with self._counter_lock:
+                self.write_errors += 1
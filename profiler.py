@@ -0,0 +1,156 @@
+"""
+Low-overhead sampling profiler for the serving and training hot paths.
+A background thread periodically snapshots every thread's Python stack and
+aggregates them as folded stacks, which flamegraph.pl and speedscope read
+directly. Nothing runs while the profiler is stopped.
+"""
+
+import os
+import signal
+import sys
+import threading
+import time
+from collections import Counter
+
+
+def _frame_label(frame):
+    """
+    Label a stack frame as 'function (file:first_line)'.
+    """
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def _folded_stack(frame, thread_name):
+    """
+    Build a root-to-leaf, semicolon-separated stack for one thread.
+    """
+    labels = []
+    while frame is not None:
+        labels.append(_frame_label(frame))
+        frame = frame.f_back
+    labels.append(thread_name)
+    return ";".join(reversed(labels))
+
+
+class SamplingProfiler:
+    """
+    Sample all thread stacks every `interval` seconds for a bounded window.
+    """
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.samples = 0
+        self.started_at = None
+        self.output_path = None
+        self._stacks = Counter()
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    @property
+    def is_running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, duration=None, interval=None, output_path=None):
+        """
+        Start sampling in the background.
+
+        Args:
+            duration: Stop automatically after this many seconds (None = until stop())
+            interval: Override the sampling interval in seconds
+            output_path: Write folded stacks here when sampling ends
+
+        Returns:
+            False if the profiler was already running, True otherwise
+        """
+        if self.is_running:
+            return False
+        if interval is not None:
+            self.interval = interval
+        self.reset()
+        self.output_path = output_path
+        self.started_at = time.time()
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._sample, args=(duration,),
+                                        name="sampling-profiler", daemon=True)
+        self._thread.start()
+        return True
+
+    def stop(self):
+        """
+        Stop sampling and wait for the sampler thread to finish.
+        """
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def reset(self):
+        """
+        Discard collected samples.
+        """
+        with self._lock:
+            self._stacks.clear()
+            self.samples = 0
+
+    def _sample(self, duration):
+        deadline = None if duration is None else time.monotonic() + duration
+        own_id = threading.get_ident()
+        while not self._stop_event.wait(self.interval):
+            if deadline is not None and time.monotonic() >= deadline:
+                break
+            thread_names = {thread.ident: thread.name for thread in threading.enumerate()}
+            frames = sys._current_frames()
+            with self._lock:
+                for thread_id, frame in frames.items():
+                    if thread_id == own_id:
+                        continue
+                    name = thread_names.get(thread_id, f"thread-{thread_id}")
+                    self._stacks[_folded_stack(frame, name)] += 1
+                self.samples += 1
+        if self.output_path:
+            self.write_folded(self.output_path)
+
+    def folded(self):
+        """
+        Return collected samples in folded-stack format, one 'stack count' per line.
+        """
+        with self._lock:
+            stacks = self._stacks.most_common()
+        return "".join(f"{stack} {count}\n" for stack, count in stacks)
+
+    def write_folded(self, path):
+        """
+        Write collected samples to a .folded file.
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, "w") as f:
+            f.write(self.folded())
+        print(f"Profile with {self.samples} samples written to {path}")
+        return path
+
+
+def install_signal_handler(profiler, duration, output_dir=None, signum=None):
+    """
+    Start `profiler` for `duration` seconds whenever the process receives SIGUSR1.
+
+    Only possible from the main thread on platforms that have SIGUSR1.
+
+    Returns:
+        True if the handler was installed
+    """
+    signum = signum or getattr(signal, "SIGUSR1", None)
+    if signum is None or threading.current_thread() is not threading.main_thread():
+        return False
+
+    def handle_signal(received_signum, frame):
+        output_path = None
+        if output_dir:
+            output_path = os.path.join(output_dir, f"profile_{int(time.time())}.folded")
+        if profiler.start(duration=duration, output_path=output_path):
+            print(f"Profiling for {duration}s (signal {received_signum})")
+
+    signal.signal(signum, handle_signal)
+    return True
@@ -0,0 +1,118 @@
+"""
+Post-training weight quantization for MLP and linear classifiers.
+Produces compact float16 or int8-with-scale artifacts and loads them back
+into regular sklearn estimators for inference.
+"""
+
+import copy
+import io
+import pickle
+import numpy as np
+
+QUANTIZATION_MODES = ("float16", "int8")
+
+# Training-only state that is not needed for inference
+TRAINING_ONLY_ATTRIBUTES = ("_optimizer", "_best_coefs", "_best_intercepts")
+
+
+def _weight_arrays(model):
+    """
+    Return the weight matrices of a supported model, laid out as (n_inputs, n_outputs).
+    """
+    if hasattr(model, "coefs_"):
+        return list(model.coefs_)
+    if hasattr(model, "coef_") and isinstance(model.coef_, np.ndarray):
+        return [model.coef_.T]
+    raise ValueError(f"Quantization is not supported for {type(model).__name__}")
+
+
+def _set_weight_arrays(model, weights):
+    """
+    Put weight matrices back on a model skeleton.
+    """
+    if hasattr(model, "coefs_"):
+        model.coefs_ = weights
+    elif weights is None:
+        model.coef_ = None
+    else:
+        model.coef_ = np.ascontiguousarray(weights[0].T)
+
+
+def quantize_weights(weights, mode="int8"):
+    """
+    Quantize a weight matrix.
+
+    int8 uses symmetric per-column scales, so each output unit keeps its own range.
+
+    Returns:
+        (quantized, scale) where scale is None for float16
+    """
+    if mode == "float16":
+        return weights.astype(np.float16), None
+    if mode == "int8":
+        scale = np.abs(weights).max(axis=0) / 127.0
+        scale[scale == 0] = 1.0
+        quantized = np.clip(np.round(weights / scale), -127, 127).astype(np.int8)
+        return quantized, scale.astype(np.float32)
+    raise ValueError(f"Unknown quantization mode '{mode}', expected one of {QUANTIZATION_MODES}")
+
+
+def dequantize_weights(quantized, scale=None):
+    """
+    Restore a float32 weight matrix from its quantized form.
+    """
+    weights = quantized.astype(np.float32)
+    if scale is not None:
+        weights *= scale
+    return weights
+
+
+def save_quantized_model(model, path, mode="int8"):
+    """
+    Save a fitted LogisticRegression / MLPClassifier as a quantized .npz artifact.
+
+    The artifact holds the quantized weight matrices plus a pickled copy of the
+    model with its weights and training-only state removed.
+
+    Args:
+        model: Fitted model with coef_ or coefs_
+        path: Output .npz file path
+        mode: 'float16' or 'int8'
+    """
+    weights = _weight_arrays(model)
+
+    skeleton = copy.copy(model)
+    _set_weight_arrays(skeleton, None)
+    for attribute in TRAINING_ONLY_ATTRIBUTES:
+        if hasattr(skeleton, attribute):
+            setattr(skeleton, attribute, None)
+
+    arrays = {
+        "mode": np.array(mode),
+        "skeleton": np.frombuffer(pickle.dumps(skeleton), dtype=np.uint8),
+    }
+    for i, layer in enumerate(weights):
+        quantized, scale = quantize_weights(layer, mode)
+        arrays[f"weights_{i}"] = quantized
+        if scale is not None:
+            arrays[f"scale_{i}"] = scale
+
+    np.savez(path, **arrays)
+    return path
+
+
+def load_quantized_model(path):
+    """
+    Load a quantized artifact back into an sklearn estimator with float32 weights.
+    """
+    with np.load(path) as artifact:
+        model = pickle.load(io.BytesIO(artifact["skeleton"].tobytes()))
+        weights = []
+        i = 0
+        while f"weights_{i}" in artifact:
+            scale = artifact[f"scale_{i}"] if f"scale_{i}" in artifact else None
+            weights.append(dequantize_weights(artifact[f"weights_{i}"], scale))
+            i += 1
+
+    _set_weight_arrays(model, weights)
+    return model
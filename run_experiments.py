@@ -5,9 +5,20 @@ Compares models and registers the best one to MLflow Model Registry.
 
 import mlflow
 import mlflow.sklearn
-from data_generator import generate_synthetic_data, get_data_info
-from train import train_svm, train_logistic_regression, train_neural_network
-import numpy as np
+import os
+from data_generator import generate_synthetic_data, get_data_info, compute_reference_stats
+from train import (train_svm, train_logistic_regression, train_neural_network,
+                   train_cv_sweep, calibrate_cascade, training_profiler)
+from profiler import install_signal_handler
+from model_selection import (select_best_run, LATENCY_METRIC, SIZE_METRIC,
+                             LATENCY_SLO_MS, F1_TOLERANCE)
+from run_store import RunStore, ensure_synced
+
+# Cheap model that answers confident rows in cascade serving, and the expensive
+# models that may answer the rest
+CASCADE_FIRST_STAGE = "LogReg_Baseline"
+CASCADE_SECOND_STAGE_CANDIDATES = ("SVM_RBF_Baseline", "SVM_RBF_C10", "SVM_RBF_CV_Sweep",
+                                   "NN_Single_Layer", "NN_Deep", "NN_Wide")
 
 
 def run_all_experiments():
@@ -33,6 +44,9 @@ def run_all_experiments():
     
     get_data_info(X_train, X_test, y_train, y_test)
     
+    # Logged with every run so the serving app can monitor drift against it
+    reference_stats = compute_reference_stats(X_train, y_train, scaler)
+    
     print("\n" + "="*80)
     print("EXPERIMENT 1: Baseline SVM with RBF kernel")
     print("="*80)
@@ -45,7 +59,9 @@ def run_all_experiments():
         kernel='rbf',
         gamma='scale',
         run_name="SVM_RBF_Baseline",
-        description="Baseline SVM with RBF kernel and default C=1.0"
+        description="Baseline SVM with RBF kernel and default C=1.0",
+        approximate=True,
+        reference_stats=reference_stats
     )
     
     print("\n" + "="*80)
@@ -61,7 +77,9 @@ def run_all_experiments():
         kernel='rbf',
         gamma='scale',
         run_name="SVM_RBF_C10",
-        description="SVM with higher C=10 to reduce regularization"
+        description="SVM with higher C=10 to reduce regularization",
+        approximate=True,
+        reference_stats=reference_stats
     )
     
     print("\n" + "="*80)
@@ -76,7 +94,8 @@ def run_all_experiments():
         kernel='linear',
         gamma='scale',
         run_name="SVM_Linear",
-        description="SVM with linear kernel for simpler decision boundary"
+        description="SVM with linear kernel for simpler decision boundary",
+        reference_stats=reference_stats
     )
     
     print("\n" + "="*80)
@@ -91,7 +110,9 @@ def run_all_experiments():
         max_iter=1000,
         solver='lbfgs',
         run_name="LogReg_Baseline",
-        description="Baseline Logistic Regression with C=1.0"
+        description="Baseline Logistic Regression with C=1.0",
+        quantize="int8",
+        reference_stats=reference_stats
     )
     
     print("\n" + "="*80)
@@ -106,7 +127,9 @@ def run_all_experiments():
         max_iter=1000,
         solver='lbfgs',
         run_name="LogReg_C0.1",
-        description="Logistic Regression with stronger regularization C=0.1"
+        description="Logistic Regression with stronger regularization C=0.1",
+        quantize="int8",
+        reference_stats=reference_stats
     )
     
     print("\n" + "="*80)
@@ -121,7 +144,9 @@ def run_all_experiments():
         alpha=0.0001,
         learning_rate_init=0.001,
         run_name="NN_Single_Layer",
-        description="Neural Network with single hidden layer (100 neurons)"
+        description="Neural Network with single hidden layer (100 neurons)",
+        quantize="int8",
+        reference_stats=reference_stats
     )
     
     print("\n" + "="*80)
@@ -136,7 +161,9 @@ def run_all_experiments():
         alpha=0.001,
         learning_rate_init=0.001,
         run_name="NN_Deep",
-        description="Deeper Neural Network with 2 hidden layers and stronger regularization"
+        description="Deeper Neural Network with 2 hidden layers and stronger regularization",
+        quantize="int8",
+        reference_stats=reference_stats
     )
     
     print("\n" + "="*80)
@@ -151,7 +178,45 @@ def run_all_experiments():
         alpha=0.0001,
         learning_rate_init=0.001,
         run_name="NN_Wide",
-        description="Wider Neural Network with 200 neurons in hidden layer"
+        description="Wider Neural Network with 200 neurons in hidden layer",
+        quantize="int8",
+        reference_stats=reference_stats
+    )
+    
+    print("\n" + "="*80)
+    print("EXPERIMENT 9: Cross-validated Logistic Regression regularization path")
+    print("="*80)
+    print("Rationale: Instead of comparing C values on a single holdout split, score")
+    print("a sweep of C with 5-fold CV in parallel, warm-starting each fit from the")
+    print("previous C so the whole path costs little more than one cold fit.")
+    
+    model9, acc9, f1_9 = train_cv_sweep(
+        X_train, X_test, y_train, y_test,
+        model_type="LogisticRegression",
+        param_values=(0.01, 0.1, 1.0, 10.0),
+        measure_warm_start=True,
+        run_name="LogReg_CV_Sweep",
+        description="5-fold CV sweep of C with warm-started Logistic Regression",
+        reference_stats=reference_stats,
+        max_iter=1000,
+        solver='lbfgs'
+    )
+    
+    print("\n" + "="*80)
+    print("EXPERIMENT 10: Cross-validated SVM RBF regularization sweep")
+    print("="*80)
+    print("Rationale: Score the RBF SVM C values with 5-fold CV in parallel to get")
+    print("mean and spread per setting rather than a single holdout estimate.")
+    
+    model10, acc10, f1_10 = train_cv_sweep(
+        X_train, X_test, y_train, y_test,
+        model_type="SVM",
+        param_values=(0.1, 1.0, 10.0),
+        run_name="SVM_RBF_CV_Sweep",
+        description="5-fold CV sweep of C for the RBF SVM",
+        reference_stats=reference_stats,
+        kernel='rbf',
+        gamma='scale'
     )
     
     # Compare all results
@@ -168,22 +233,55 @@ def run_all_experiments():
         ("NN_Single_Layer", acc6, f1_6),
         ("NN_Deep", acc7, f1_7),
         ("NN_Wide", acc8, f1_8),
+        ("LogReg_CV_Sweep", acc9, f1_9),
+        ("SVM_RBF_CV_Sweep", acc10, f1_10),
     ]
+    models = [model1, model2, model3, model4, model5, model6, model7, model8, model9, model10]
+    
+    # Serving benchmarks were logged by the trainers; use the latest run per name
+    store = RunStore()
+    experiment_id = ensure_synced(store)
+    names = [r[0] for r in results]
+    runs = store.latest_runs_by_name(experiment_id, names).set_index('tags.mlflow.runName', drop=False)
     
-    print(f"\n{'Model':<25} {'Accuracy':<15} {'F1 Score':<15}")
-    print("-" * 55)
+    print(f"\n{'Model':<25} {'Accuracy':<12} {'F1 Score':<12} {'Latency (ms)':<15} {'Size (KB)':<12}")
+    print("-" * 76)
     for name, acc, f1 in results:
-        print(f"{name:<25} {acc:<15.4f} {f1:<15.4f}")
+        latency = runs.loc[name, LATENCY_METRIC]
+        size_kb = runs.loc[name, SIZE_METRIC] / 1024
+        print(f"{name:<25} {acc:<12.4f} {f1:<12.4f} {latency:<15.3f} {size_kb:<12.1f}")
     
-    # Find best model based on F1 score
-    best_idx = np.argmax([r[2] for r in results])
+    # Find best model on the F1 / latency / size Pareto front
+    best_run = select_best_run(runs)
+    best_idx = names.index(best_run['tags.mlflow.runName'])
     best_name, best_acc, best_f1 = results[best_idx]
     
     print("\n" + "="*80)
     print(f"BEST MODEL: {best_name}")
     print(f"Test Accuracy: {best_acc:.4f}")
     print(f"Test F1 Score: {best_f1:.4f}")
+    print(f"Single-row Latency: {best_run[LATENCY_METRIC]:.3f} ms")
+    if LATENCY_SLO_MS is not None:
+        print(f"Latency SLO: {LATENCY_SLO_MS} ms")
+    print(f"F1 Tolerance: {F1_TOLERANCE}")
+    print("="*80)
+    
+    print("\n" + "="*80)
+    print("CASCADE CALIBRATION")
     print("="*80)
+    print("Rationale: Let the cheap Logistic Regression answer the rows it is confident")
+    print("about and escalate only the rest to the most accurate expensive model, with")
+    print("the threshold set so the cascade stays within 0.01 of that model's test accuracy.")
+    
+    first_idx = names.index(CASCADE_FIRST_STAGE)
+    second_idx = max((names.index(name) for name in CASCADE_SECOND_STAGE_CANDIDATES),
+                     key=lambda i: results[i][2])
+    print(f"First stage: {CASCADE_FIRST_STAGE}, second stage: {names[second_idx]}")
+    calibrate_cascade(
+        models[first_idx], models[second_idx], X_test, y_test,
+        first_stage_run_id=runs.loc[CASCADE_FIRST_STAGE, 'run_id'],
+        second_stage_run_id=runs.loc[names[second_idx], 'run_id']
+    )
     
     return results, best_name, best_idx
 
@@ -196,12 +294,10 @@ def register_best_model(best_model_name):
     print("REGISTERING BEST MODEL TO MODEL REGISTRY")
     print("="*80)
     
-    # Get the best run
-    experiment = mlflow.get_experiment_by_name("Classification_Experiments")
-    runs = mlflow.search_runs(experiment_ids=[experiment.experiment_id])
-    
-    # Find the run with the best model name
-    best_run = runs[runs['tags.mlflow.runName'] == best_model_name].iloc[0]
+    # Find the latest run with the best model name in the local run store
+    store = RunStore()
+    experiment_id = ensure_synced(store)
+    best_run = store.run_by_name(experiment_id, best_model_name)
     best_run_id = best_run['run_id']
     
     print(f"Best Run ID: {best_run_id}")
@@ -227,12 +323,27 @@ def register_best_model(best_model_name):
         )
         print(f"Model transitioned to Production stage!")
         
+        # Only promote the quantized artifact if it stayed within tolerance
+        quantization_approved = best_run.get('tags.quantization_approved')
+        if quantization_approved == "true":
+            client.set_model_version_tag(model_name, model_version.version,
+                                         "quantized_artifact", "quantized_model/quantized_model.npz")
+            print("Quantized artifact approved for serving.")
+        elif quantization_approved == "false":
+            print(f"Refusing to promote quantized artifact: it is not smaller than the model "
+                  f"or its accuracy drop {best_run['metrics.quantized_accuracy_drop']:.4f} / "
+                  f"F1 drop {best_run['metrics.quantized_f1_drop']:.4f} exceeds tolerance.")
+        
     except Exception as e:
         print(f"Error registering model: {e}")
         print("Note: Model registry might require MLflow tracking server.")
 
 
 if __name__ == "__main__":
+    # `kill -USR1 <pid>` profiles the next PROFILE_SECONDS of training; the
+    # samples are attached to the runs that were active
+    install_signal_handler(training_profiler, float(os.environ.get("PROFILE_SECONDS", 30)))
+    
     # Run all experiments
     results, best_name, best_idx = run_all_experiments()
     
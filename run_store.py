@@ -0,0 +1,251 @@
+"""
+Local SQLite index of MLflow run metadata.
+Keeps run ID, run name, key metrics and artifact location so that
+"best run" and "run by name" lookups do not scan the whole experiment.
+
+Resync from MLflow with:
+    python run_store.py resync
+"""
+
+import argparse
+import os
+import sqlite3
+from contextlib import contextmanager
+import mlflow
+import pandas as pd
+
+RUN_STORE_PATH = os.environ.get("RUN_STORE_PATH", os.path.join("mlruns", "run_index.db"))
+EXPERIMENT_NAME = "Classification_Experiments"
+
+# Metrics mirrored from MLflow; also the only columns allowed in ORDER BY
+INDEXED_METRICS = (
+    "test_accuracy",
+    "test_f1_score",
+    "single_row_latency_ms",
+    "batch_latency_ms",
+    "model_size_bytes",
+    "model_load_time_ms",
+    "quantized_accuracy_drop",
+    "quantized_f1_drop",
+)
+INDEXED_TAGS = ("quantization_approved",)
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS runs (
+    run_id TEXT PRIMARY KEY,
+    experiment_id TEXT NOT NULL,
+    run_name TEXT,
+    model_type TEXT,
+    start_time INTEGER,
+    artifact_uri TEXT,
+    {", ".join(f"{metric} REAL" for metric in INDEXED_METRICS)},
+    {", ".join(f"{tag} TEXT" for tag in INDEXED_TAGS)}
+);
+CREATE INDEX IF NOT EXISTS idx_runs_name ON runs (experiment_id, run_name, start_time DESC);
+CREATE INDEX IF NOT EXISTS idx_runs_f1 ON runs (experiment_id, test_f1_score DESC);
+CREATE INDEX IF NOT EXISTS idx_runs_latency ON runs (experiment_id, single_row_latency_ms);
+"""
+
+
+class RunStore:
+    """
+    SQLite-backed index of finished MLflow runs.
+    """
+
+    def __init__(self, path=RUN_STORE_PATH):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        """
+        Open a connection that commits on success and is always closed.
+        """
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _run_row(run):
+        """
+        Flatten an MLflow Run entity into a runs table row.
+        """
+        metrics = run.data.metrics
+        tags = run.data.tags
+        row = {
+            "run_id": run.info.run_id,
+            "experiment_id": run.info.experiment_id,
+            "run_name": tags.get("mlflow.runName", run.info.run_name),
+            "model_type": run.data.params.get("model_type"),
+            "start_time": run.info.start_time,
+            "artifact_uri": run.info.artifact_uri,
+        }
+        row.update({metric: metrics.get(metric) for metric in INDEXED_METRICS})
+        row.update({tag: tags.get(tag) for tag in INDEXED_TAGS})
+        return row
+
+    def _upsert(self, conn, runs):
+        rows = [self._run_row(run) for run in runs]
+        if not rows:
+            return
+        columns = ", ".join(rows[0])
+        placeholders = ", ".join("?" for _ in rows[0])
+        conn.executemany(f"INSERT OR REPLACE INTO runs ({columns}) VALUES ({placeholders})",
+                         [list(row.values()) for row in rows])
+
+    def record_run(self, run):
+        """
+        Insert or update one MLflow Run entity.
+        """
+        with self._connect() as conn:
+            self._upsert(conn, [run])
+
+    def record_run_id(self, run_id):
+        """
+        Fetch a run from MLflow and record it.
+        """
+        self.record_run(mlflow.get_run(run_id))
+
+    def resync(self, experiment_name=EXPERIMENT_NAME):
+        """
+        Rebuild the index for an experiment from MLflow.
+
+        Returns:
+            Number of runs recorded
+        """
+        experiment = mlflow.get_experiment_by_name(experiment_name)
+        if experiment is None:
+            return 0
+        client = mlflow.tracking.MlflowClient()
+        runs = []
+        page_token = None
+        while True:
+            page = client.search_runs([experiment.experiment_id], max_results=1000,
+                                      page_token=page_token)
+            runs.extend(page)
+            page_token = page.token
+            if not page_token:
+                break
+
+        with self._connect() as conn:
+            conn.execute("DELETE FROM runs WHERE experiment_id = ?", (experiment.experiment_id,))
+            self._upsert(conn, runs)
+        return len(runs)
+
+    def count(self, experiment_id):
+        """
+        Number of indexed runs for an experiment.
+        """
+        with self._connect() as conn:
+            return conn.execute("SELECT COUNT(*) FROM runs WHERE experiment_id = ?",
+                                (experiment_id,)).fetchone()[0]
+
+    def best_run(self, experiment_id, metric="test_f1_score", ascending=False):
+        """
+        Return the run with the best value of an indexed metric, or None.
+        """
+        if metric not in INDEXED_METRICS:
+            raise ValueError(f"'{metric}' is not an indexed metric")
+        order = "ASC" if ascending else "DESC"
+        rows = self._query(
+            f"SELECT * FROM runs WHERE experiment_id = ? AND {metric} IS NOT NULL "
+            f"ORDER BY {metric} {order} LIMIT 1",
+            (experiment_id,),
+        )
+        return None if rows.empty else rows.iloc[0]
+
+    def run_by_name(self, experiment_id, run_name):
+        """
+        Return the most recent run with the given name, or None.
+        """
+        rows = self._query(
+            "SELECT * FROM runs WHERE experiment_id = ? AND run_name = ? "
+            "ORDER BY start_time DESC LIMIT 1",
+            (experiment_id, run_name),
+        )
+        return None if rows.empty else rows.iloc[0]
+
+    def latest_runs_by_name(self, experiment_id, run_names):
+        """
+        Return the most recent run for each of the given names.
+        """
+        placeholders = ", ".join("?" for _ in run_names)
+        return self._query(
+            f"SELECT * FROM runs r WHERE experiment_id = ? AND run_name IN ({placeholders}) "
+            "AND start_time = (SELECT MAX(start_time) FROM runs "
+            "WHERE experiment_id = r.experiment_id AND run_name = r.run_name)",
+            (experiment_id, *run_names),
+        )
+
+    def selection_candidates(self, experiment_id, latency_slo_ms=None, f1_tolerance=0.0):
+        """
+        Return only the runs model_selection.select_best_run can pick.
+
+        Any run that dominates a near-best run is itself near-best, so the
+        selection over this subset matches the selection over all runs.
+        """
+        slo_filter = ""
+        params = [experiment_id]
+        if latency_slo_ms is not None:
+            slo_filter = " AND single_row_latency_ms <= ?"
+            params.append(latency_slo_ms)
+
+        rows = self._query(
+            "SELECT * FROM runs WHERE experiment_id = ?" + slo_filter + " AND test_f1_score >= "
+            "(SELECT MAX(test_f1_score) FROM runs WHERE experiment_id = ?" + slo_filter + ") - ?",
+            (*params, *params, f1_tolerance),
+        )
+        if rows.empty and latency_slo_ms is not None:
+            # Nothing meets the SLO; let the selector fall back to the fastest run
+            rows = self._query(
+                "SELECT * FROM runs WHERE experiment_id = ? AND single_row_latency_ms IS NOT NULL "
+                "ORDER BY single_row_latency_ms LIMIT 1",
+                (experiment_id,),
+            )
+        return rows
+
+    def _query(self, sql, params):
+        """
+        Run a query and return rows with mlflow.search_runs-style column names.
+        """
+        with self._connect() as conn:
+            rows = pd.read_sql_query(sql, conn, params=params)
+        rename = {"run_name": "tags.mlflow.runName", "model_type": "params.model_type"}
+        rename.update({metric: f"metrics.{metric}" for metric in INDEXED_METRICS})
+        rename.update({tag: f"tags.{tag}" for tag in INDEXED_TAGS})
+        return rows.rename(columns=rename)
+
+
+def ensure_synced(store, experiment_name=EXPERIMENT_NAME):
+    """
+    Resync the store if it has no runs for the experiment yet.
+
+    Returns:
+        The experiment ID
+    """
+    experiment = mlflow.get_experiment_by_name(experiment_name)
+    if experiment is None:
+        raise ValueError(f"Experiment '{experiment_name}' not found")
+    if store.count(experiment.experiment_id) == 0:
+        print(f"Run store is empty for '{experiment_name}', resyncing from MLflow...")
+        store.resync(experiment_name)
+    return experiment.experiment_id
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Manage the local run metadata store.")
+    parser.add_argument("command", choices=["resync"])
+    parser.add_argument("--experiment", default=EXPERIMENT_NAME)
+    parser.add_argument("--path", default=RUN_STORE_PATH)
+    args = parser.parse_args()
+
+    if args.command == "resync":
+        n_runs = RunStore(args.path).resync(args.experiment)
+        print(f"Indexed {n_runs} runs from '{args.experiment}' into {args.path}")
@@ -5,8 +5,26 @@ Tests data generation, training, and model validation.
 
 import pytest
 import numpy as np
-from data_generator import generate_synthetic_data
-from train import train_svm, train_logistic_regression, train_neural_network
+import gzip
+import os
+import json
+import threading
+import time
+from data_generator import generate_synthetic_data, compute_reference_stats
+from drift_monitor import StreamingFeatureStats, DriftMonitor
+from train import (train_svm, train_logistic_regression, train_neural_network,
+                   train_cv_sweep, measure_latency)
+from model_selection import pareto_front, select_best_run
+from run_store import RunStore
+from profiler import SamplingProfiler
+from prediction_log import PredictionLogSink
+from quantization import save_quantized_model, load_quantized_model
+from mmap_artifact import save_mmap_model, load_mmap_model
+from cascade import ModelCascade, calibrate_threshold
+from sklearn.linear_model import LogisticRegression
+from sklearn.neural_network import MLPClassifier
+from sklearn.svm import SVC
+import pandas as pd
 import mlflow
 
 
@@ -138,6 +156,780 @@ class TestModelPrediction:
         assert all(p in [0, 1] for p in predictions), "Predictions should be valid class labels"
 
 
+class TestServingOptimizations:
+    """Test serving-oriented model variants and measurements."""
+    
+    @pytest.fixture
+    def serving_data(self):
+        """Generate sample data with the default feature layout."""
+        return generate_synthetic_data(
+            n_samples=200,
+            n_features=20,
+            n_classes=3,
+            random_state=42
+        )
+    
+    def test_svm_kernel_approximation(self, serving_data):
+        """Test that the approximate SVM variant is logged next to the exact one."""
+        X_train, X_test, y_train, y_test, scaler = serving_data
+        
+        mlflow.set_experiment("test_experiment")
+        model, acc, f1 = train_svm(
+            X_train, X_test, y_train, y_test,
+            run_name="test_svm_approx",
+            approximate=True,
+            n_components=50
+        )
+        
+        metrics = mlflow.last_active_run().data.metrics
+        assert metrics["n_support_vectors"] == model.n_support_.sum()
+        assert metrics["approx_latency_ms_per_row"] > 0, "Approx latency should be logged"
+        assert "approx_f1_diff" in metrics, "F1 difference should be logged"
+    
+    @pytest.mark.parametrize("mode", ["float16", "int8"])
+    def test_quantized_round_trip(self, serving_data, tmp_path, mode):
+        """Test that a quantized MLP predicts like the original and is smaller."""
+        X_train, X_test, y_train, y_test, scaler = serving_data
+        model = MLPClassifier(hidden_layer_sizes=(50,), max_iter=300, random_state=42)
+        model.fit(X_train, y_train)
+        
+        path = save_quantized_model(model, tmp_path / "model.npz", mode=mode)
+        quantized = load_quantized_model(path)
+        
+        agreement = np.mean(quantized.predict(X_test) == model.predict(X_test))
+        assert agreement >= 0.95, "Quantized model should agree with the original"
+        assert quantized.coefs_[0].dtype == np.float32
+    
+    def test_quantized_logistic_regression_training(self, serving_data):
+        """Test that quantization metrics and approval are logged to the run."""
+        X_train, X_test, y_train, y_test, scaler = serving_data
+        
+        mlflow.set_experiment("test_experiment")
+        train_logistic_regression(
+            X_train, X_test, y_train, y_test,
+            run_name="test_logreg_quantized",
+            quantize="int8"
+        )
+        
+        run = mlflow.last_active_run()
+        assert "quantized_f1_drop" in run.data.metrics
+        assert run.data.tags["quantization_approved"] in ("true", "false")
+        if run.data.metrics["quantized_size_ratio"] >= 1:
+            assert run.data.tags["quantization_approved"] == "false"
+    
+    @pytest.mark.parametrize("model", [
+        SVC(probability=True, random_state=42),
+        MLPClassifier(hidden_layer_sizes=(50,), max_iter=300, random_state=42),
+    ])
+    def test_mmap_round_trip(self, serving_data, tmp_path, model):
+        """Test that a memory-mapped model predicts exactly like the original."""
+        X_train, X_test, y_train, y_test, scaler = serving_data
+        model.fit(X_train, y_train)
+        
+        manifest = save_mmap_model(model, str(tmp_path / "mmap_model"))
+        loaded = load_mmap_model(str(tmp_path / "mmap_model"))
+        
+        assert manifest["n_arrays"] > 0, "Large arrays should go into the mapped buffer"
+        assert np.array_equal(loaded.predict(X_test), model.predict(X_test))
+        assert np.allclose(loaded.predict_proba(X_test), model.predict_proba(X_test))
+    
+    def test_mmap_arrays_are_mapped(self, serving_data, tmp_path):
+        """Test that loaded weights are views of the memory map, not copies."""
+        X_train, X_test, y_train, y_test, scaler = serving_data
+        model = SVC(random_state=42).fit(X_train, y_train)
+        save_mmap_model(model, str(tmp_path / "mmap_model"))
+        loaded = load_mmap_model(str(tmp_path / "mmap_model"))
+        
+        base = loaded.support_vectors_
+        while base.base is not None and not isinstance(base, np.memmap):
+            base = base.base
+        assert isinstance(base, np.memmap)
+        assert loaded.support_vectors_.ctypes.data % 64 == 0, "Buffers should be aligned"
+    
+    def test_cv_sweep_logs_per_setting_metrics(self, serving_data):
+        """Test that a CV sweep logs mean/std per setting and the warm-start saving."""
+        X_train, X_test, y_train, y_test, scaler = serving_data
+        
+        mlflow.set_experiment("test_experiment")
+        model, acc, f1 = train_cv_sweep(
+            X_train, X_test, y_train, y_test,
+            model_type="LogisticRegression",
+            param_values=(0.1, 1.0),
+            n_splits=3,
+            n_jobs=2,
+            measure_warm_start=True,
+            run_name="test_cv_sweep",
+            max_iter=1000
+        )
+        
+        metrics = mlflow.last_active_run().data.metrics
+        for value in (0.1, 1.0):
+            assert f"cv_mean_f1_score_C_{value}" in metrics
+            assert f"cv_std_f1_score_C_{value}" in metrics
+        assert "cv_warm_start_time_saved_est_s" in metrics
+        assert 0 <= f1 <= 1, "F1 score should be between 0 and 1"
+    
+    def test_measure_latency(self, serving_data):
+        """Test that latency measurement returns a positive duration."""
+        X_train, X_test, y_train, y_test, scaler = serving_data
+        model = LogisticRegression(max_iter=1000).fit(X_train, y_train)
+        
+        assert measure_latency(model, X_test, n_repeats=3) > 0
+
+
+class TestModelSelection:
+    """Test latency- and size-aware model selection."""
+    
+    @pytest.fixture
+    def runs(self):
+        """Runs where a much slower model wins by a tiny F1 margin."""
+        return pd.DataFrame({
+            "run_id": ["fast", "slow", "dominated"],
+            "metrics.test_f1_score": [0.900, 0.901, 0.850],
+            "metrics.single_row_latency_ms": [0.1, 1.0, 2.0],
+            "metrics.model_size_bytes": [1000, 50000, 60000],
+        })
+    
+    def test_pareto_front_drops_dominated_runs(self, runs):
+        """Test that dominated runs are not on the Pareto front."""
+        front = pareto_front(runs)
+        assert set(front["run_id"]) == {"fast", "slow"}
+    
+    def test_tolerance_prefers_cheaper_model(self, runs):
+        """Test that a near-tie in F1 is resolved in favour of latency."""
+        assert select_best_run(runs, f1_tolerance=0.005)["run_id"] == "fast"
+        assert select_best_run(runs, f1_tolerance=0.0)["run_id"] == "slow"
+    
+    def test_latency_slo(self, runs):
+        """Test that runs over the latency SLO are excluded."""
+        assert select_best_run(runs, latency_slo_ms=0.5, f1_tolerance=0.0)["run_id"] == "fast"
+
+
+class TestRunStore:
+    """Test the local run metadata index."""
+    
+    @pytest.fixture
+    def trained_run(self):
+        """Train one small model and return its MLflow run."""
+        X_train, X_test, y_train, y_test, scaler = generate_synthetic_data(
+            n_samples=200,
+            n_features=20,
+            random_state=42
+        )
+        mlflow.set_experiment("test_run_store")
+        train_logistic_regression(
+            X_train, X_test, y_train, y_test,
+            run_name="test_store_logreg"
+        )
+        return mlflow.last_active_run()
+    
+    def test_record_and_lookup(self, trained_run, tmp_path):
+        """Test that a recorded run can be found by name and by metric."""
+        store = RunStore(str(tmp_path / "runs.db"))
+        store.record_run(trained_run)
+        experiment_id = trained_run.info.experiment_id
+        
+        by_name = store.run_by_name(experiment_id, "test_store_logreg")
+        assert by_name["run_id"] == trained_run.info.run_id
+        assert by_name["metrics.test_f1_score"] == trained_run.data.metrics["test_f1_score"]
+        assert store.best_run(experiment_id, "test_f1_score")["run_id"] == trained_run.info.run_id
+    
+    def test_resync(self, trained_run, tmp_path):
+        """Test that resync indexes every run of the experiment."""
+        store = RunStore(str(tmp_path / "runs.db"))
+        n_runs = store.resync("test_run_store")
+        
+        assert n_runs >= 1
+        assert store.count(trained_run.info.experiment_id) == n_runs
+
+
+class TestProfiler:
+    """Test the sampling profiler."""
+    
+    def test_folded_stacks_capture_busy_function(self, tmp_path):
+        """Test that a busy function shows up in the folded output file."""
+        profiler = SamplingProfiler(interval=0.001)
+        output_path = tmp_path / "profile.folded"
+        profiler.start(duration=0.2, output_path=str(output_path))
+        
+        def busy_loop():
+            total = 0
+            deadline = time.monotonic() + 0.3
+            while time.monotonic() < deadline:
+                total += 1
+            return total
+        
+        busy_loop()
+        profiler.stop()
+        
+        assert profiler.samples > 0
+        assert "busy_loop" in output_path.read_text()
+        for line in profiler.folded().splitlines():
+            stack, count = line.rsplit(" ", 1)
+            assert int(count) > 0
+    
+    def test_training_profile_artifact(self):
+        """Test that profile=True attaches folded stacks to the run."""
+        X_train, X_test, y_train, y_test, scaler = generate_synthetic_data(
+            n_samples=200,
+            n_features=20,
+            random_state=42
+        )
+        mlflow.set_experiment("test_experiment")
+        train_logistic_regression(
+            X_train, X_test, y_train, y_test,
+            run_name="test_profiled",
+            profile=True
+        )
+        
+        run = mlflow.last_active_run()
+        artifacts = mlflow.tracking.MlflowClient().list_artifacts(run.info.run_id, "profile")
+        assert [a.path for a in artifacts] == ["profile/profile_test_profiled.folded"]
+        assert run.data.metrics["profile_samples"] > 0
+
+
+class TestDriftMonitor:
+    """Test streaming feature statistics and drift detection."""
+    
+    @pytest.fixture
+    def reference(self):
+        """Reference statistics from generated training data."""
+        X_train, X_test, y_train, y_test, scaler = generate_synthetic_data(
+            n_samples=5000,
+            n_features=20,
+            random_state=42
+        )
+        return compute_reference_stats(X_train, y_train, scaler), X_test
+    
+    def test_streaming_stats_match_batch_stats(self):
+        """Test that batched Welford updates match statistics over all rows."""
+        rng = np.random.default_rng(0)
+        X = rng.normal(3.0, 2.0, size=(1000, 5))
+        stats = StreamingFeatureStats(5)
+        for batch in np.array_split(X, 7):
+            stats.update(batch)
+        
+        assert stats.count == 1000
+        assert np.allclose(stats.mean, X.mean(axis=0))
+        assert np.allclose(stats.variance, X.var(axis=0))
+        assert np.allclose(stats.min, X.min(axis=0))
+        assert np.allclose(stats.max, X.max(axis=0))
+        assert stats.bin_counts.sum(axis=1).tolist() == [1000] * 5
+    
+    def test_memory_is_constant(self):
+        """Test that state size does not grow with traffic."""
+        stats = StreamingFeatureStats(5)
+        stats.update(np.zeros((10, 5)))
+        shapes = (stats.mean.shape, stats.bin_counts.shape)
+        stats.update(np.ones((10000, 5)))
+        assert (stats.mean.shape, stats.bin_counts.shape) == shapes
+    
+    def test_shifted_traffic_is_flagged(self, reference):
+        """Test that shifted features show up as drifted while unshifted traffic does not."""
+        reference_stats, X_test = reference
+        classes = np.arange(3)
+        
+        monitor = DriftMonitor(20, classes, reference=reference_stats)
+        monitor.update(X_test, np.zeros(len(X_test), dtype=int))
+        assert monitor.report()['drift']['drifted_features'] == []
+        
+        shifted = X_test.copy()
+        shifted[:, 3] += 2.0
+        monitor = DriftMonitor(20, classes, reference=reference_stats)
+        monitor.update(shifted, np.zeros(len(shifted), dtype=int))
+        drift = monitor.report()['drift']
+        assert drift['drifted_features'] == [3]
+        assert drift['prediction_psi'] > 0.2
+
+
+class TestPredictionLog:
+    """Test the asynchronous prediction log sink."""
+    
+    def test_records_are_written_as_json_lines(self, tmp_path):
+        """Test that every queued record ends up in the file after close."""
+        path = tmp_path / "predictions.jsonl"
+        sink = PredictionLogSink(str(path), on_full="block")
+        for i in range(100):
+            sink.write({"request": i})
+        sink.close()
+        
+        records = [json.loads(line) for line in path.read_text().splitlines()]
+        assert [r["request"] for r in records] == list(range(100))
+        assert sink.stats()["written"] == 100
+    
+    def test_drop_policy_accounts_for_every_record(self, tmp_path):
+        """Test that a full queue drops records and counts them."""
+        sink = PredictionLogSink(str(tmp_path / "predictions.jsonl"), max_queue_size=1)
+        accepted = sum(sink.write({"request": i}) for i in range(2000))
+        sink.close()
+        
+        stats = sink.stats()
+        assert stats["written"] == accepted
+        assert stats["written"] + stats["dropped"] == 2000
+    
+    def test_slow_traffic_is_batched(self, tmp_path):
+        """Test that records trickling in within flush_interval share one write."""
+        sink = PredictionLogSink(str(tmp_path / "predictions.jsonl"), flush_interval=2.0)
+        batch_sizes = []
+        write_batch = sink._write_batch
+        sink._write_batch = lambda batch: (batch_sizes.append(len(batch)), write_batch(batch))
+        for i in range(20):
+            sink.write({"request": i})
+            time.sleep(0.01)
+        sink.close()
+        
+        assert sum(batch_sizes) == 20
+        assert len(batch_sizes) <= 2
+    
+    def test_block_policy_gives_up_on_dead_writer(self, tmp_path):
+        """Test that 'block' drops after block_timeout instead of hanging."""
+        sink = PredictionLogSink(str(tmp_path / "predictions.jsonl"), max_queue_size=1,
+                                 on_full="block", block_timeout=0.1)
+        sink.close()
+        assert sink.write({"request": 0})
+        
+        start = time.perf_counter()
+        assert not sink.write({"request": 1})
+        assert time.perf_counter() - start < 2
+        assert sink.stats()["dropped"] == 1
+    
+    def test_compression_does_not_block_writer(self, tmp_path):
+        """Test that records keep being written while a rotated file is compressed."""
+        sink = PredictionLogSink(str(tmp_path / "predictions.jsonl"), flush_interval=0.01,
+                                 max_bytes=200, compress=True)
+        release = threading.Event()
+        compress = sink._compress
+        sink._compress = lambda path: (release.wait(10), compress(path))
+        
+        for i in range(50):
+            sink.write({"request": i})
+        deadline = time.time() + 5
+        while sink.stats()["written"] < 50 and time.time() < deadline:
+            time.sleep(0.01)
+        written_while_compressing = sink.stats()["written"]
+        release.set()
+        sink.close()
+        
+        assert written_while_compressing == 50
+        assert sink.stats()["rotations"] > 0
+        assert len(list(tmp_path.glob("predictions.jsonl.*.gz"))) == sink.stats()["rotations"]
+    
+    def test_size_rotation_with_compression(self, tmp_path):
+        """Test that rotated files are compressed and no record is lost."""
+        path = tmp_path / "predictions.jsonl"
+        sink = PredictionLogSink(str(path), batch_size=10, flush_interval=0.01,
+                                 max_bytes=200, compress=True, on_full="block")
+        for i in range(300):
+            sink.write({"request": i})
+        sink.close()
+        
+        rotated = sorted(tmp_path.glob("predictions.jsonl.*.gz"))
+        assert sink.stats()["rotations"] == len(rotated) > 0
+        lines = []
+        for rotated_path in rotated:
+            with gzip.open(rotated_path, "rt") as f:
+                lines.extend(f.read().splitlines())
+        if path.exists():
+            lines.extend(path.read_text().splitlines())
+        assert sorted(json.loads(line)["request"] for line in lines) == list(range(300))
+
+
+class TestModelCascade:
+    """Test the confidence-gated model cascade."""
+    
+    @pytest.fixture
+    def stages(self):
+        """Cheap and expensive models fitted on the same data."""
+        X_train, X_test, y_train, y_test, scaler = generate_synthetic_data(
+            n_samples=400,
+            n_features=20,
+            n_classes=3,
+            random_state=42
+        )
+        first = LogisticRegression(max_iter=1000).fit(X_train, y_train)
+        second = SVC(kernel='rbf', random_state=42).fit(X_train, y_train)
+        return first, second, X_test, y_test
+    
+    def test_only_uncertain_rows_are_escalated(self, stages):
+        """Test that the second stage only sees rows below the threshold."""
+        first, second, X_test, y_test = stages
+        seen = []
+        
+        class RecordingModel:
+            def predict(self, X):
+                seen.append(len(X))
+                return second.predict(X)
+        
+        threshold = 0.8
+        cascade = ModelCascade(first, RecordingModel(), threshold)
+        predictions = cascade.predict(X_test)
+        
+        uncertain = first.predict_proba(X_test).max(axis=1) < threshold
+        assert seen == [uncertain.sum()]
+        assert np.array_equal(predictions[~uncertain], first.predict(X_test)[~uncertain])
+        assert np.array_equal(predictions[uncertain], second.predict(X_test[uncertain]))
+        assert cascade.stats()['escalated_rows'] == uncertain.sum()
+    
+    def test_threshold_extremes(self, stages):
+        """Test that threshold 0 serves the first stage and inf serves the second."""
+        first, second, X_test, y_test = stages
+        assert np.array_equal(ModelCascade(first, second, 0.0).predict(X_test), first.predict(X_test))
+        assert np.array_equal(ModelCascade(first, second, np.inf).predict(X_test), second.predict(X_test))
+    
+    def test_no_probabilities_for_second_stage_without_proba(self, stages):
+        """Test that rows answered by an SVC without probabilities get NaN, not certainty."""
+        first, second, X_test, y_test = stages
+        predictions, proba, escalated = ModelCascade(first, second, 0.8).predict_with_proba(X_test)
+        assert np.isnan(proba[escalated]).all()
+        assert np.allclose(proba[~escalated].sum(axis=1), 1.0)
+        assert np.array_equal(predictions[escalated], second.predict(X_test[escalated]))
+    
+    def test_each_stage_runs_once_per_call(self, stages):
+        """Test that one cascade call runs each stage at most once and counts rows once."""
+        first, second, X_test, y_test = stages
+        calls = {"first": 0, "second": 0}
+        
+        class CountingModel:
+            def __init__(self, model, name):
+                self.model = model
+                self.name = name
+                self.classes_ = model.classes_
+                self.n_features_in_ = model.n_features_in_
+            
+            def predict(self, X):
+                calls[self.name] += 1
+                return self.model.predict(X)
+        
+        class CountingProbaModel(CountingModel):
+            def predict_proba(self, X):
+                calls[self.name] += 1
+                return self.model.predict_proba(X)
+        
+        cascade = ModelCascade(CountingProbaModel(first, "first"), CountingModel(second, "second"), np.inf)
+        cascade.predict_with_proba(X_test[:1])
+        assert calls == {"first": 1, "second": 1}
+        assert cascade.stats()['rows'] == 1
+    
+    def test_linear_fast_path_matches_sklearn(self, stages):
+        """Test that the direct linear first stage gives sklearn's probabilities."""
+        first, second, X_test, y_test = stages
+        cascade = ModelCascade(first, second, 0.8)
+        assert cascade.fast_first_stage
+        assert np.allclose(cascade._linear_proba(X_test), first.predict_proba(X_test))
+        
+        # Non-linear first stages keep the sklearn path
+        mlp = MLPClassifier(hidden_layer_sizes=(10,), max_iter=200, random_state=42).fit(X_test, y_test)
+        assert not ModelCascade(mlp, second, 0.8).fast_first_stage
+    
+    def test_calibrated_threshold_is_lowest_meeting_target(self, stages):
+        """Test the calibrated threshold against a brute-force scan."""
+        first, second, X_test, y_test = stages
+        proba = first.predict_proba(X_test)
+        first_correct = first.predict(X_test) == y_test
+        second_correct = second.predict(X_test) == y_test
+        target = second_correct.mean()
+        
+        calibration = calibrate_threshold(proba, first_correct, second_correct, target)
+        
+        def accuracy(threshold):
+            return (ModelCascade(first, second, threshold).predict(X_test) == y_test).mean()
+        
+        confidence = proba.max(axis=1)
+        reaching = [t for t in np.append(np.unique(confidence), np.inf) if accuracy(t) >= target]
+        assert calibration['target_reached']
+        assert calibration['threshold'] == reaching[0]
+        assert calibration['accuracy'] == pytest.approx(accuracy(calibration['threshold']))
+        assert calibration['escalation_fraction'] == pytest.approx(
+            (confidence < calibration['threshold']).mean())
+
+
+class TestServingApp:
+    """Test the Flask app model loading, health probes and warm-up."""
+    
+    @pytest.fixture(scope="class")
+    def app_module(self, tmp_path_factory):
+        """The app module imported without a startup load, logging to a temp directory."""
+        overrides = {
+            "LOAD_MODEL_ON_STARTUP": "false",
+            "PREDICTION_LOG_PATH": str(tmp_path_factory.mktemp("logs") / "predictions.jsonl"),
+        }
+        saved = {key: os.environ.get(key) for key in overrides}
+        os.environ.update(overrides)
+        try:
+            import app
+        finally:
+            for key, value in saved.items():
+                if value is None:
+                    os.environ.pop(key)
+                else:
+                    os.environ[key] = value
+        yield app
+        if app.prediction_log is not None:
+            app.prediction_log.close()
+    
+    @pytest.fixture
+    def app_module_loading(self, app_module, monkeypatch):
+        """The app in its initial 'loading' state with a fitted stub model to load."""
+        X_train, X_test, y_train, y_test, scaler = generate_synthetic_data(
+            n_samples=200,
+            n_features=20,
+            random_state=42
+        )
+        stub = LogisticRegression(max_iter=1000).fit(X_train, y_train)
+        monkeypatch.setattr(app_module, "model", None)
+        monkeypatch.setattr(app_module, "drift_monitor", None)
+        monkeypatch.setattr(app_module, "model_state", {
+            'status': 'loading',
+            'run_id': None,
+            'error': None,
+            'load_duration_ms': None,
+            'warmup_duration_ms': None,
+            'cascade_calibration': None,
+        })
+        monkeypatch.setattr(app_module, "load_model", lambda: (stub, "stub-run"))
+        monkeypatch.setattr(app_module, "load_reference_stats", lambda run_id: None)
+        return app_module
+    
+    def test_no_model_loaded_at_import(self, app_module):
+        """Test that LOAD_MODEL_ON_STARTUP=false leaves loading to the caller."""
+        assert app_module.model_loader is None
+    
+    def test_liveness(self, app_module_loading):
+        """Test that liveness does not depend on the model."""
+        client = app_module_loading.app.test_client()
+        assert client.get("/health/live").status_code == 200
+    
+    def test_readiness_follows_model_loading(self, app_module_loading):
+        """Test that readiness is 503 while loading and 200 once loaded and warm."""
+        app = app_module_loading
+        client = app.app.test_client()
+        
+        response = client.get("/health/ready")
+        assert response.status_code == 503
+        assert response.get_json()["status"] == "loading"
+        assert client.post("/predict", json={"features": [0.0] * 20}).status_code == 503
+        
+        app.load_model_in_background()
+        
+        response = client.get("/health/ready")
+        body = response.get_json()
+        assert response.status_code == 200
+        assert body["status"] == "ready"
+        assert body["run_id"] == "stub-run"
+        assert body["warmup_duration_ms"] is not None
+        assert client.post("/predict", json={"features": [0.0] * 20}).status_code == 200
+    
+    def test_cascade_predict_is_one_pass(self, app_module_loading, monkeypatch):
+        """Test that /predict runs the cascade once and flags escalated rows."""
+        app = app_module_loading
+        X_train, X_test, y_train, y_test, scaler = generate_synthetic_data(
+            n_samples=200,
+            n_features=20,
+            random_state=42
+        )
+        first = LogisticRegression(max_iter=1000).fit(X_train, y_train)
+        second = SVC(random_state=42).fit(X_train, y_train)
+        cascade = ModelCascade(first, second, np.inf)
+        monkeypatch.setattr(app, "model", cascade)
+        monkeypatch.setattr(app, "drift_monitor", DriftMonitor(20, first.classes_))
+        
+        client = app.app.test_client()
+        body = client.post("/predict", json={"features": X_test[0].tolist()}).get_json()
+        assert body["escalated"] is True
+        assert "probabilities" not in body
+        assert body["prediction"] == second.predict(X_test[:1])[0]
+        assert cascade.stats()['rows'] == 1
+    
+    def test_requests_while_loading_are_logged(self, app_module_loading, monkeypatch):
+        """Test that 503 responses before the model is ready reach the audit log."""
+        app = app_module_loading
+        records = []
+        
+        class RecordingSink:
+            def write(self, record):
+                records.append(record)
+        
+        monkeypatch.setattr(app, "prediction_log", RecordingSink())
+        response = app.app.test_client().post("/predict", json={"features": [0.0] * 20})
+        
+        assert response.status_code == 503
+        assert len(records) == 1
+        assert records[0]["status_code"] == 503
+        assert records[0]["features"] == [0.0] * 20
+        assert "not ready" in records[0]["error"]
+    
+    def test_batch_predict_splits_uncertain_rows(self, app_module_loading, monkeypatch):
+        """Test that a batch /predict sends only the uncertain rows to the second stage."""
+        app = app_module_loading
+        X_train, X_test, y_train, y_test, scaler = generate_synthetic_data(
+            n_samples=200,
+            n_features=20,
+            random_state=42
+        )
+        first = LogisticRegression(max_iter=1000).fit(X_train, y_train)
+        second = SVC(random_state=42).fit(X_train, y_train)
+        second_batches = []
+        
+        class RecordingModel:
+            def predict(self, X):
+                second_batches.append(len(X))
+                return second.predict(X)
+        
+        cascade = ModelCascade(first, RecordingModel(), 0.8)
+        monkeypatch.setattr(app, "model", cascade)
+        monkeypatch.setattr(app, "drift_monitor", DriftMonitor(20, first.classes_))
+        
+        rows = X_test[:10]
+        body = app.app.test_client().post("/predict", json={"features": rows.tolist()}).get_json()
+        uncertain = first.predict_proba(rows).max(axis=1) < 0.8
+        
+        assert body["num_rows"] == 10
+        assert body["escalated"] == uncertain.tolist()
+        assert second_batches == ([int(uncertain.sum())] if uncertain.any() else [])
+        assert [p is None for p in body["probabilities"]] == uncertain.tolist()
+        assert cascade.stats()['rows'] == 10
+    
+    def test_batch_predict_without_cascade(self, app_module_loading):
+        """Test that a plain model answers a list of rows with one prediction per row."""
+        app = app_module_loading
+        app.load_model_in_background()
+        body = app.app.test_client().post("/predict", json={"features": [[0.0] * 20] * 3}).get_json()
+        assert body["num_rows"] == 3
+        assert len(body["predictions"]) == len(body["probabilities"]) == 3
+    
+    @pytest.mark.parametrize("saving, force, enabled", [
+        (-20.0, False, False),
+        (None, False, False),
+        (-20.0, True, True),
+        (15.0, False, True),
+    ])
+    def test_cascade_requires_single_row_saving(self, app_module, monkeypatch, saving, force, enabled):
+        """Test that load_cascade refuses calibrations without a single-row saving unless forced."""
+        X_train, X_test, y_train, y_test, scaler = generate_synthetic_data(
+            n_samples=200,
+            n_features=20,
+            random_state=42
+        )
+        stage = LogisticRegression(max_iter=1000).fit(X_train, y_train)
+        
+        class CalibrationRun:
+            class info:
+                run_id = "calibration"
+            
+            class data:
+                params = {'first_stage_run_id': "first", 'second_stage_run_id': "second",
+                          'threshold': "0.8"}
+                metrics = {} if saving is None else {'single_row_latency_saved_pct': saving}
+        
+        class Store:
+            def run_by_name(self, experiment_id, run_name):
+                return {'run_id': "calibration"}
+        
+        monkeypatch.setattr(app_module, "CASCADE_FORCE", force)
+        monkeypatch.setattr(app_module, "RunStore", Store)
+        monkeypatch.setattr(app_module, "ensure_synced", lambda store: "0")
+        monkeypatch.setattr(app_module.mlflow, "get_run", lambda run_id: CalibrationRun)
+        monkeypatch.setattr(app_module.mlflow.sklearn, "load_model", lambda uri: stage)
+        
+        cascade, run_id, metrics = app_module.load_cascade()
+        assert run_id == "second"
+        assert isinstance(cascade, ModelCascade) == enabled
+    
+    def test_failed_load_is_reported(self, app_module_loading, monkeypatch):
+        """Test that a failed load keeps readiness red and reports the error."""
+        app = app_module_loading
+        
+        def failing_load():
+            raise RuntimeError("no runs")
+        
+        monkeypatch.setattr(app, "load_model", failing_load)
+        app.load_model_in_background()
+        
+        client = app.app.test_client()
+        response = client.get("/health/ready")
+        assert response.status_code == 503
+        assert response.get_json()["status"] == "failed"
+        assert response.get_json()["error"] == "no runs"
+        assert client.post("/predict", json={"features": [0.0] * 20}).status_code == 500
+    
+    def test_failed_drift_monitor_fails_the_load(self, app_module_loading, monkeypatch):
+        """Test that a reference that does not fit the model marks the load failed."""
+        app = app_module_loading
+        reference = {"bin_edges": np.tile(np.linspace(-4, 4, 11), (5, 1))}
+        monkeypatch.setattr(app, "load_reference_stats", lambda run_id: reference)
+        app.load_model_in_background()
+        
+        response = app.app.test_client().get("/health/ready")
+        assert response.status_code == 503
+        assert response.get_json()["status"] == "failed"
+        assert "bin_edges" in response.get_json()["error"]
+        assert app.model is None
+    
+    def test_failed_mmap_download_leaves_no_temp_dir(self, app_module, monkeypatch, tmp_path):
+        """Test that a failed remote mmap download cleans up its temporary directory."""
+        class RemoteRun:
+            class info:
+                artifact_uri = "s3://bucket/artifacts"
+        
+        def failing_download(**kwargs):
+            raise OSError("connection reset")
+        
+        monkeypatch.setattr(app_module, "MMAP_CACHE_DIR", str(tmp_path))
+        monkeypatch.setattr(app_module.mlflow, "get_run", lambda run_id: RemoteRun)
+        monkeypatch.setattr(app_module.mlflow.artifacts, "download_artifacts", failing_download)
+        
+        with pytest.raises(OSError):
+            app_module.mmap_artifact_dir("remote-run")
+        assert os.listdir(tmp_path / "remote-run") == []
+    
+    def test_admin_profile_requires_token(self, app_module, monkeypatch):
+        """Test that the profiling endpoint is not open without a token."""
+        monkeypatch.setattr(app_module, "ADMIN_TOKEN", None)
+        client = app_module.app.test_client()
+        assert client.post("/admin/profile?seconds=1").status_code == 403
+    
+    def test_admin_profile_rejects_wrong_token(self, app_module, monkeypatch):
+        """Test that a wrong or missing token is rejected when admin is enabled."""
+        monkeypatch.setattr(app_module, "ADMIN_TOKEN", "secret")
+        client = app_module.app.test_client()
+        assert client.get("/admin/profile", headers={"X-Admin-Token": "secreT"}).status_code == 403
+        assert client.get("/admin/profile").status_code == 403
+        assert client.get("/admin/profile", headers={"X-Admin-Token": "secret"}).status_code == 200
+    
+    @pytest.mark.parametrize("query", ["interval_ms=0", "interval_ms=-5", "seconds=0", "seconds=abc"])
+    def test_admin_profile_rejects_invalid_parameters(self, app_module, monkeypatch, query):
+        """Test that non-positive or malformed profiling parameters are rejected."""
+        monkeypatch.setattr(app_module, "ADMIN_TOKEN", "secret")
+        client = app_module.app.test_client()
+        response = client.post(f"/admin/profile?{query}", headers={"X-Admin-Token": "secret"})
+        assert response.status_code == 400
+        assert not app_module.profiler.is_running
+    
+    def test_admin_profile_clamps_interval(self, app_module, monkeypatch, tmp_path):
+        """Test that the sampling interval is raised to the minimum."""
+        monkeypatch.setattr(app_module, "ADMIN_TOKEN", "secret")
+        monkeypatch.setattr(app_module, "PROFILE_DIR", str(tmp_path))
+        client = app_module.app.test_client()
+        response = client.post("/admin/profile?seconds=0.1&interval_ms=0.01",
+                               headers={"X-Admin-Token": "secret"})
+        app_module.profiler.stop()
+        assert response.status_code == 200
+        assert response.get_json()["interval_ms"] == app_module.PROFILE_MIN_INTERVAL_MS
+    
+    def test_warm_up_uses_model_feature_count(self, app_module):
+        """Test that warm-up batches match the model's n_features_in_."""
+        shapes = []
+        
+        class RecordingModel:
+            n_features_in_ = 7
+            
+            def predict(self, X):
+                shapes.append(X.shape)
+                return np.zeros(len(X), dtype=int)
+        
+        app_module.warm_up(RecordingModel())
+        assert shapes == [(1, 7), (app_module.WARMUP_BATCH_SIZE, 7)] * app_module.WARMUP_BATCHES
+
 if __name__ == "__main__":
     # Run tests
     pytest.main([__file__, "-v"])
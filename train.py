@@ -6,13 +6,29 @@ Supports SVM, Logistic Regression, and Neural Network models.
 import mlflow
 import mlflow.sklearn
 import numpy as np
-from sklearn.svm import SVC
+import pickle
+import time
+from sklearn.svm import SVC, LinearSVC
+from sklearn.kernel_approximation import Nystroem
+from sklearn.pipeline import Pipeline
 from sklearn.linear_model import LogisticRegression
 from sklearn.metrics import accuracy_score, precision_score, recall_score, f1_score, confusion_matrix
 from sklearn.neural_network import MLPClassifier
+from sklearn.model_selection import StratifiedKFold
+from joblib import Parallel, delayed
 import matplotlib.pyplot as plt
 import seaborn as sns
 import os
+import sqlite3
+import tempfile
+from quantization import save_quantized_model, load_quantized_model
+from mmap_artifact import save_mmap_model, load_mmap_model
+from run_store import RunStore
+from profiler import SamplingProfiler
+from cascade import ModelCascade, calibrate_threshold
+
+# Shared by all trainers; also started for a bounded window by SIGUSR1 in run_experiments.py
+training_profiler = SamplingProfiler()
 
 
 def log_metrics(y_true, y_pred, prefix=""):
@@ -51,8 +67,264 @@ def plot_confusion_matrix(y_true, y_pred, run_name):
     os.remove(plot_path)
 
 
+def record_active_run():
+    """
+    Index the active run in the local run store so that best-run lookups
+    do not have to search MLflow.
+    """
+    try:
+        RunStore().record_run_id(mlflow.active_run().info.run_id)
+    except sqlite3.Error as e:
+        print(f"Could not update run store: {e}")
+
+
+def start_run_profile(profile=False):
+    """
+    Start collecting samples for the active run.
+    
+    Samples from a signal-triggered window that is already running are kept
+    from this point on, so each run only gets its own share of the profile.
+    
+    Returns:
+        True if the profiler was started for this run and must be stopped by it
+    """
+    training_profiler.reset()
+    return training_profiler.start() if profile else False
+
+
+def log_run_profile(run_name, started=False):
+    """
+    Attach collected samples to the active run as a folded-stack artifact.
+    """
+    if started:
+        training_profiler.stop()
+    if training_profiler.samples == 0:
+        return
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, f"profile_{run_name}.folded")
+        training_profiler.write_folded(path)
+        mlflow.log_artifact(path, "profile")
+    mlflow.log_metric("profile_samples", training_profiler.samples)
+
+
+def measure_latency(model, X, n_repeats=20):
+    """
+    Measure the median wall-clock time of model.predict on X, in milliseconds.
+    """
+    model.predict(X)  # Warm-up call, not timed
+    timings = []
+    for _ in range(n_repeats):
+        start = time.perf_counter()
+        model.predict(X)
+        timings.append(time.perf_counter() - start)
+    return float(np.median(timings)) * 1000
+
+
+def measure_load_time(load, n_repeats=5):
+    """
+    Measure the median wall-clock time of load(), in milliseconds.
+    
+    Used for every artifact format with the files already written to disk, so
+    pickle and mmap load times are comparable.
+    """
+    timings = []
+    for _ in range(n_repeats):
+        start = time.perf_counter()
+        load()
+        timings.append(time.perf_counter() - start)
+    return float(np.median(timings)) * 1000
+
+
+def measure_row_latency(predict, X, n_repeats=3):
+    """
+    Measure the mean wall-clock time of predict on one row of X at a time, in
+    milliseconds; the median over n_repeats passes.
+    """
+    rows = [X[i:i + 1] for i in range(len(X))]
+    predict(rows[0])  # Warm-up call, not timed
+    timings = []
+    for _ in range(n_repeats):
+        start = time.perf_counter()
+        for row in rows:
+            predict(row)
+        timings.append((time.perf_counter() - start) / len(rows))
+    return float(np.median(timings)) * 1000
+
+
+def load_pickle(path):
+    """
+    Unpickle a model from a file.
+    """
+    with open(path, "rb") as f:
+        return pickle.load(f)
+
+
+def benchmark_model(model, X, n_repeats=20):
+    """
+    Benchmark the serving cost of a fitted model and log it to the active run.
+    
+    Logs single-row and full-batch predict latency, serialized size and
+    load time of the pickle file so that model selection can trade them off
+    against accuracy.
+    
+    Args:
+        model: Fitted model to benchmark
+        X: Batch of inputs, e.g. the test set
+        n_repeats: Number of timed repetitions per measurement
+    """
+    payload = pickle.dumps(model)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "model.pkl")
+        with open(path, "wb") as f:
+            f.write(payload)
+        load_time = measure_load_time(lambda: load_pickle(path))
+    
+    batch_latency = measure_latency(model, X, n_repeats)
+    benchmarks = {
+        "single_row_latency_ms": measure_latency(model, X[:1], n_repeats),
+        "batch_latency_ms": batch_latency,
+        "batch_latency_ms_per_row": batch_latency / len(X),
+        "model_size_bytes": len(payload),
+        "model_load_time_ms": load_time,
+    }
+    mlflow.log_metrics(benchmarks)
+    
+    print(f"Single-row latency: {benchmarks['single_row_latency_ms']:.3f} ms, "
+          f"model size: {benchmarks['model_size_bytes'] / 1024:.1f} KB")
+    
+    return benchmarks
+
+
+def log_kernel_approximation(exact_model, X_train, X_test, y_train, y_test,
+                             gamma='scale', n_components=300):
+    """
+    Fit a serving-optimized Nystroem + linear SVM variant of an exact SVC and
+    log its latency and accuracy next to the exact model in the active run.
+    
+    Prediction cost of the exact SVC grows with its number of support vectors,
+    while the approximation costs a fixed n_components kernel evaluations per row.
+    
+    Args:
+        exact_model: Fitted SVC to compare against
+        gamma: Kernel coefficient the exact model was trained with
+        n_components: Number of Nystroem landmark points (the support-vector budget)
+    """
+    # Resolve gamma the same way SVC does, since Nystroem needs a number
+    if gamma == 'scale':
+        gamma = 1.0 / (X_train.shape[1] * X_train.var())
+    elif gamma == 'auto':
+        gamma = 1.0 / X_train.shape[1]
+    n_components = min(n_components, X_train.shape[0])
+    
+    approx_model = Pipeline([
+        ("nystroem", Nystroem(kernel=exact_model.kernel, gamma=gamma,
+                              degree=exact_model.degree, coef0=exact_model.coef0,
+                              n_components=n_components, random_state=42)),
+        ("linear_svm", LinearSVC(C=exact_model.C, dual='auto', max_iter=5000,
+                                 random_state=42)),
+    ])
+    approx_model.fit(X_train, y_train)
+    
+    mlflow.log_param("approx_n_components", n_components)
+    
+    # Accuracy of both variants on the same holdout set
+    y_exact_pred = exact_model.predict(X_test)
+    exact_acc = accuracy_score(y_test, y_exact_pred)
+    exact_f1 = f1_score(y_test, y_exact_pred, average='weighted', zero_division=0)
+    approx_acc, _, _, approx_f1 = log_metrics(y_test, approx_model.predict(X_test), "approx_test_")
+    
+    # Per-row latency measured over the whole test batch
+    n_support_vectors = int(exact_model.n_support_.sum())
+    exact_latency = measure_latency(exact_model, X_test) / len(X_test)
+    approx_latency = measure_latency(approx_model, X_test) / len(X_test)
+    
+    mlflow.log_metric("n_support_vectors", n_support_vectors)
+    mlflow.log_metric("exact_latency_ms_per_row", exact_latency)
+    mlflow.log_metric("approx_latency_ms_per_row", approx_latency)
+    mlflow.log_metric("approx_speedup", exact_latency / approx_latency)
+    mlflow.log_metric("approx_accuracy_diff", approx_acc - exact_acc)
+    mlflow.log_metric("approx_f1_diff", approx_f1 - exact_f1)
+    
+    mlflow.sklearn.log_model(approx_model, "approx_model")
+    
+    print(f"Support vectors: {n_support_vectors} (approximation budget: {n_components})")
+    print(f"Latency per row: exact {exact_latency:.4f} ms, approx {approx_latency:.4f} ms")
+    print(f"Approx F1 difference: {approx_f1 - exact_f1:+.4f}")
+    
+    return approx_model
+
+
+def log_mmap_model(model):
+    """
+    Log the model in the memory-mappable artifact format next to the pickle.
+    
+    Serving processes can map its arrays instead of unpickling a private copy.
+    """
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        artifact_dir = os.path.join(tmp_dir, "mmap_model")
+        save_mmap_model(model, artifact_dir)
+        
+        # Timed like model_load_time_ms in benchmark_model, from files on disk
+        mlflow.log_metric("mmap_model_load_time_ms",
+                          measure_load_time(lambda: load_mmap_model(artifact_dir)))
+        
+        mlflow.log_artifacts(artifact_dir, "mmap_model")
+
+
+def log_quantized_model(model, X_test, y_test, test_acc, test_f1,
+                        mode="int8", tolerance=0.01):
+    """
+    Quantize a fitted MLP / linear model, evaluate the quantized copy and log it
+    to the active run.
+    
+    The quantized artifact is only approved for promotion when it is smaller
+    than the pickled model and neither accuracy nor F1 drops by more than the
+    tolerance; the decision is recorded in the 'quantization_approved' tag.
+    
+    Args:
+        model: Fitted LogisticRegression or MLPClassifier
+        test_acc: Test accuracy of the original model
+        test_f1: Test F1 score of the original model
+        mode: 'float16' or 'int8'
+        tolerance: Maximum allowed drop in accuracy and F1
+    """
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        artifact_path = os.path.join(tmp_dir, "quantized_model.npz")
+        save_quantized_model(model, artifact_path, mode=mode)
+        quantized_size = os.path.getsize(artifact_path)
+        
+        # Evaluate through the same load path used for serving
+        quantized_model = load_quantized_model(artifact_path)
+        quant_acc, _, _, quant_f1 = log_metrics(y_test, quantized_model.predict(X_test), "quantized_test_")
+        
+        mlflow.log_artifact(artifact_path, "quantized_model")
+    
+    # Tiny linear models can grow, since the npz container outweighs the weights saved
+    model_size = len(pickle.dumps(model))
+    size_ratio = quantized_size / model_size
+    
+    accuracy_drop = test_acc - quant_acc
+    f1_drop = test_f1 - quant_f1
+    approved = size_ratio < 1 and accuracy_drop <= tolerance and f1_drop <= tolerance
+    
+    mlflow.log_param("quantization_mode", mode)
+    mlflow.log_param("quantization_tolerance", tolerance)
+    mlflow.log_metric("quantized_model_size_bytes", quantized_size)
+    mlflow.log_metric("quantized_size_ratio", size_ratio)
+    mlflow.log_metric("quantized_accuracy_drop", accuracy_drop)
+    mlflow.log_metric("quantized_f1_drop", f1_drop)
+    mlflow.set_tag("quantization_approved", str(approved).lower())
+    
+    print(f"Quantized ({mode}) size: {quantized_size / 1024:.1f} KB ({size_ratio:.2f}x), "
+          f"F1 drop: {f1_drop:+.4f} ({'approved' if approved else 'rejected'})")
+    
+    return quantized_model, approved
+
+
 def train_svm(X_train, X_test, y_train, y_test, C=1.0, kernel='rbf', 
-              gamma='scale', run_name="SVM", description=""):
+              gamma='scale', run_name="SVM", description="",
+              approximate=False, n_components=300, profile=False,
+              reference_stats=None):
     """
     Train SVM classifier with MLflow tracking.
     
@@ -62,8 +334,15 @@ def train_svm(X_train, X_test, y_train, y_test, C=1.0, kernel='rbf',
         gamma: Kernel coefficient
         run_name: Name for the MLflow run
         description: Description of the experiment
+        approximate: Also train and log a low-latency Nystroem approximation
+        n_components: Number of Nystroem components when approximate=True
+        profile: Attach a sampling profile of the run as an MLflow artifact
+        reference_stats: Training-data statistics for drift monitoring
+            (data_generator.compute_reference_stats), logged as reference_stats.json
     """
     with mlflow.start_run(run_name=run_name):
+        profiling = start_run_profile(profile)
+        
         # Log parameters
         mlflow.log_param("model_type", "SVM")
         mlflow.log_param("C", C)
@@ -92,18 +371,31 @@ def train_svm(X_train, X_test, y_train, y_test, C=1.0, kernel='rbf',
         # Log confusion matrix
         plot_confusion_matrix(y_test, y_test_pred, run_name)
         
-        # Log model
+        # Log model, its memory-mappable copy and its serving cost
         mlflow.sklearn.log_model(model, "model")
+        log_mmap_model(model)
+        benchmark_model(model, X_test)
+        if reference_stats:
+            mlflow.log_dict(reference_stats, "reference_stats.json")
         
         print(f"Test Accuracy: {test_acc:.4f}")
         print(f"Test F1 Score: {test_f1:.4f}")
         
+        # Log serving-optimized variant for comparison
+        if approximate:
+            log_kernel_approximation(model, X_train, X_test, y_train, y_test,
+                                     gamma=gamma, n_components=n_components)
+        
+        log_run_profile(run_name, profiling)
+        record_active_run()
+        
         return model, test_acc, test_f1
 
 
 def train_logistic_regression(X_train, X_test, y_train, y_test, C=1.0, 
                               max_iter=1000, solver='lbfgs', run_name="LogisticRegression",
-                              description=""):
+                              description="", quantize=None, quantize_tolerance=0.01,
+                              profile=False, reference_stats=None):
     """
     Train Logistic Regression classifier with MLflow tracking.
     
@@ -113,8 +405,15 @@ def train_logistic_regression(X_train, X_test, y_train, y_test, C=1.0,
         solver: Algorithm to use ('lbfgs', 'liblinear', 'saga')
         run_name: Name for the MLflow run
         description: Description of the experiment
+        quantize: Also log a quantized artifact ('float16' or 'int8')
+        quantize_tolerance: Maximum accuracy/F1 drop allowed for promotion
+        profile: Attach a sampling profile of the run as an MLflow artifact
+        reference_stats: Training-data statistics for drift monitoring
+            (data_generator.compute_reference_stats), logged as reference_stats.json
     """
     with mlflow.start_run(run_name=run_name):
+        profiling = start_run_profile(profile)
+        
         # Log parameters
         mlflow.log_param("model_type", "LogisticRegression")
         mlflow.log_param("C", C)
@@ -144,18 +443,32 @@ def train_logistic_regression(X_train, X_test, y_train, y_test, C=1.0,
         # Log confusion matrix
         plot_confusion_matrix(y_test, y_test_pred, run_name)
         
-        # Log model
+        # Log model, its memory-mappable copy and its serving cost
         mlflow.sklearn.log_model(model, "model")
+        log_mmap_model(model)
+        benchmark_model(model, X_test)
+        if reference_stats:
+            mlflow.log_dict(reference_stats, "reference_stats.json")
         
         print(f"Test Accuracy: {test_acc:.4f}")
         print(f"Test F1 Score: {test_f1:.4f}")
         
+        # Log compact quantized artifact
+        if quantize:
+            log_quantized_model(model, X_test, y_test, test_acc, test_f1,
+                                mode=quantize, tolerance=quantize_tolerance)
+        
+        log_run_profile(run_name, profiling)
+        record_active_run()
+        
         return model, test_acc, test_f1
 
 
 def train_neural_network(X_train, X_test, y_train, y_test, 
                         hidden_layers=(100,), alpha=0.0001, learning_rate_init=0.001,
-                        run_name="NeuralNetwork", description=""):
+                        run_name="NeuralNetwork", description="",
+                        quantize=None, quantize_tolerance=0.01, profile=False,
+                        reference_stats=None):
     """
     Train Neural Network (MLP) classifier with MLflow tracking.
     
@@ -165,8 +478,15 @@ def train_neural_network(X_train, X_test, y_train, y_test,
         learning_rate_init: Initial learning rate
         run_name: Name for the MLflow run
         description: Description of the experiment
+        quantize: Also log a quantized artifact ('float16' or 'int8')
+        quantize_tolerance: Maximum accuracy/F1 drop allowed for promotion
+        profile: Attach a sampling profile of the run as an MLflow artifact
+        reference_stats: Training-data statistics for drift monitoring
+            (data_generator.compute_reference_stats), logged as reference_stats.json
     """
     with mlflow.start_run(run_name=run_name):
+        profiling = start_run_profile(profile)
+        
         # Log parameters
         mlflow.log_param("model_type", "NeuralNetwork")
         mlflow.log_param("hidden_layers", str(hidden_layers))
@@ -203,10 +523,283 @@ def train_neural_network(X_train, X_test, y_train, y_test,
         # Log confusion matrix
         plot_confusion_matrix(y_test, y_test_pred, run_name)
         
-        # Log model
+        # Log model, its memory-mappable copy and its serving cost
         mlflow.sklearn.log_model(model, "model")
+        log_mmap_model(model)
+        benchmark_model(model, X_test)
+        if reference_stats:
+            mlflow.log_dict(reference_stats, "reference_stats.json")
         
         print(f"Test Accuracy: {test_acc:.4f}")
         print(f"Test F1 Score: {test_f1:.4f}")
         
+        # Log compact quantized artifact
+        if quantize:
+            log_quantized_model(model, X_test, y_test, test_acc, test_f1,
+                                mode=quantize, tolerance=quantize_tolerance)
+        
+        log_run_profile(run_name, profiling)
+        record_active_run()
+        
         return model, test_acc, test_f1
+
+
+# Regularization parameter swept by train_cv_sweep for each model type, and the
+# order that walks from strongest to weakest regularization so each warm-started
+# fit only has to move a little from the previous solution
+CV_SWEEP_PARAMS = {
+    "LogisticRegression": ("C", False),
+    "SVM": ("C", False),
+    "NeuralNetwork": ("alpha", True),
+}
+
+
+def _make_sweep_model(model_type, warm_start, model_params):
+    """
+    Build the estimator for one point of a regularization sweep.
+    """
+    if model_type == "LogisticRegression":
+        return LogisticRegression(warm_start=warm_start, random_state=42, **model_params)
+    if model_type == "NeuralNetwork":
+        return MLPClassifier(warm_start=warm_start, random_state=42, **model_params)
+    if model_type == "SVM":
+        # libsvm has no warm start; every SVM fit is cold
+        return SVC(random_state=42, **model_params)
+    raise ValueError(f"Unknown model type '{model_type}', expected one of {list(CV_SWEEP_PARAMS)}")
+
+
+def _fit_regularization_path(model_type, param_name, param_values, X_train, y_train,
+                             X_val, y_val, warm_start, model_params):
+    """
+    Fit one CV fold along a sweep of regularization values.
+    
+    Returns:
+        (list of (accuracy, f1) per value, fit time in seconds)
+    """
+    model = _make_sweep_model(model_type, warm_start, model_params)
+    scores = []
+    fit_time = 0.0
+    for value in param_values:
+        model.set_params(**{param_name: value})
+        start = time.perf_counter()
+        model.fit(X_train, y_train)
+        fit_time += time.perf_counter() - start
+        
+        y_pred = model.predict(X_val)
+        scores.append((accuracy_score(y_val, y_pred),
+                       f1_score(y_val, y_pred, average='weighted', zero_division=0)))
+    return scores, fit_time
+
+
+def train_cv_sweep(X_train, X_test, y_train, y_test, model_type="LogisticRegression",
+                   param_values=(0.01, 0.1, 1.0, 10.0), n_splits=5, n_jobs=-1,
+                   warm_start=True, measure_warm_start=False, run_name="CV_Sweep",
+                   description="", profile=False, reference_stats=None, **model_params):
+    """
+    Cross-validate a sweep of regularization values in one parent MLflow run.
+    
+    CV folds run in parallel; within a fold each fit warm-starts from the
+    previous value's solution (not available for SVM). The best value is refit
+    on the full training set and evaluated on the test set like the other trainers.
+    
+    Args:
+        model_type: 'LogisticRegression', 'SVM' or 'NeuralNetwork'
+        param_values: Values of C (LogisticRegression, SVM) or alpha (NeuralNetwork)
+        n_splits: Number of stratified CV folds
+        n_jobs: Number of parallel fold workers (-1 = all cores)
+        warm_start: Warm-start each fit along the sweep
+        measure_warm_start: Also time warm and cold paths on the first fold to log
+            the fit time saved; runs two extra paths serially after the CV
+        run_name: Name for the MLflow run
+        description: Description of the experiment
+        profile: Attach a sampling profile of the run as an MLflow artifact
+        reference_stats: Training-data statistics for drift monitoring
+            (data_generator.compute_reference_stats), logged as reference_stats.json
+        model_params: Extra estimator parameters, e.g. max_iter or hidden_layer_sizes
+    """
+    param_name, descending = CV_SWEEP_PARAMS[model_type]
+    param_values = sorted(param_values, reverse=descending)
+    warm_start = warm_start and model_type != "SVM"
+    
+    with mlflow.start_run(run_name=run_name):
+        profiling = start_run_profile(profile)
+        
+        # Log parameters
+        mlflow.log_param("model_type", model_type)
+        mlflow.log_param("cv_param", param_name)
+        mlflow.log_param("cv_param_values", str(param_values))
+        mlflow.log_param("cv_n_splits", n_splits)
+        mlflow.log_param("cv_warm_start", warm_start)
+        for key, value in model_params.items():
+            mlflow.log_param(key, value)
+        mlflow.log_param("n_features", X_train.shape[1])
+        mlflow.log_param("n_samples", X_train.shape[0])
+        mlflow.log_param("n_classes", len(np.unique(y_train)))
+        
+        if description:
+            mlflow.set_tag("description", description)
+        
+        print(f"\nCross-validating {run_name} over {param_name}={param_values}...")
+        folds = list(StratifiedKFold(n_splits=n_splits, shuffle=True, random_state=42).split(X_train, y_train))
+        jobs = [
+            delayed(_fit_regularization_path)(
+                model_type, param_name, param_values,
+                X_train[train_idx], y_train[train_idx], X_train[val_idx], y_train[val_idx],
+                warm_start, model_params
+            )
+            for train_idx, val_idx in folds
+        ]
+        fold_results = Parallel(n_jobs=n_jobs)(jobs)
+        
+        # scores[fold, value, (accuracy, f1)]
+        scores = np.array([fold_scores for fold_scores, _ in fold_results])
+        fit_times = [fit_time for _, fit_time in fold_results]
+        for i, value in enumerate(param_values):
+            mlflow.log_metric(f"cv_mean_accuracy_{param_name}_{value}", scores[:, i, 0].mean())
+            mlflow.log_metric(f"cv_std_accuracy_{param_name}_{value}", scores[:, i, 0].std())
+            mlflow.log_metric(f"cv_mean_f1_score_{param_name}_{value}", scores[:, i, 1].mean())
+            mlflow.log_metric(f"cv_std_f1_score_{param_name}_{value}", scores[:, i, 1].std())
+            print(f"  {param_name}={value}: F1 {scores[:, i, 1].mean():.4f} "
+                  f"+/- {scores[:, i, 1].std():.4f}")
+        
+        mlflow.log_metric("cv_fit_time_s", sum(fit_times))
+        if warm_start and measure_warm_start:
+            # Time warm and cold paths on the first fold back to back, outside the
+            # pool, so both see the same CPU contention
+            train_idx, val_idx = folds[0]
+            first_fold = (X_train[train_idx], y_train[train_idx], X_train[val_idx], y_train[val_idx])
+            _, warm_fit_time = _fit_regularization_path(model_type, param_name, param_values,
+                                                        *first_fold, True, model_params)
+            _, cold_fit_time = _fit_regularization_path(model_type, param_name, param_values,
+                                                        *first_fold, False, model_params)
+            # Extrapolated from one fold to all folds, so only an estimate
+            time_saved_est = (cold_fit_time - warm_fit_time) * n_splits
+            mlflow.log_metric("cv_cold_fit_time_first_fold_s", cold_fit_time)
+            mlflow.log_metric("cv_warm_fit_time_first_fold_s", warm_fit_time)
+            mlflow.log_metric("cv_warm_start_time_saved_est_s", time_saved_est)
+            print(f"Warm starts saved an estimated {time_saved_est:.2f}s of fit time "
+                  f"across {n_splits} folds (first fold x {n_splits})")
+        
+        # Refit the best setting on the full training set
+        best_value = param_values[int(np.argmax(scores[:, :, 1].mean(axis=0)))]
+        mlflow.log_param(f"best_{param_name}", best_value)
+        model = _make_sweep_model(model_type, False, {**model_params, param_name: best_value})
+        model.fit(X_train, y_train)
+        
+        # Make predictions
+        y_train_pred = model.predict(X_train)
+        y_test_pred = model.predict(X_test)
+        
+        # Log metrics
+        train_acc, train_prec, train_rec, train_f1 = log_metrics(y_train, y_train_pred, "train_")
+        test_acc, test_prec, test_rec, test_f1 = log_metrics(y_test, y_test_pred, "test_")
+        
+        # Log confusion matrix
+        plot_confusion_matrix(y_test, y_test_pred, run_name)
+        
+        # Log model, its memory-mappable copy and its serving cost
+        mlflow.sklearn.log_model(model, "model")
+        log_mmap_model(model)
+        benchmark_model(model, X_test)
+        if reference_stats:
+            mlflow.log_dict(reference_stats, "reference_stats.json")
+        
+        print(f"Best {param_name}: {best_value}")
+        print(f"Test Accuracy: {test_acc:.4f}")
+        print(f"Test F1 Score: {test_f1:.4f}")
+        
+        log_run_profile(run_name, profiling)
+        record_active_run()
+        
+        return model, test_acc, test_f1
+
+
+def calibrate_cascade(first_stage, second_stage, X_test, y_test, first_stage_run_id,
+                      second_stage_run_id, target_accuracy=None, accuracy_tolerance=0.01,
+                      run_name="Cascade_Calibration"):
+    """
+    Calibrate the confidence threshold of a two-stage cascade on the test set
+    and log it, with the escalation rate and latency saved, as an MLflow run.
+    
+    The serving app reads the threshold and both stage run IDs from this run.
+    
+    Args:
+        first_stage: Cheap fitted model with predict_proba
+        second_stage: Expensive fitted model that answers escalated rows
+        first_stage_run_id: Run the first-stage model was logged in
+        second_stage_run_id: Run the second-stage model was logged in
+        target_accuracy: Required cascade accuracy
+            (default: second-stage accuracy minus accuracy_tolerance)
+        accuracy_tolerance: Accuracy the cascade may give up against the second stage
+        run_name: Name for the MLflow run
+    
+    Returns:
+        (cascade, calibration dict)
+    """
+    with mlflow.start_run(run_name=run_name):
+        first_proba = first_stage.predict_proba(X_test)
+        first_correct = first_stage.classes_[first_proba.argmax(axis=1)] == y_test
+        # Second-stage answers exactly as the cascade derives them for escalated rows
+        second_correct = ModelCascade(first_stage, second_stage, np.inf).predict(X_test) == y_test
+        second_acc = float(second_correct.mean())
+        if target_accuracy is None:
+            target_accuracy = second_acc - accuracy_tolerance
+        
+        calibration = calibrate_threshold(first_proba, first_correct, second_correct, target_accuracy)
+        cascade = ModelCascade(first_stage, second_stage, calibration['threshold'])
+        
+        mlflow.log_param("first_stage_run_id", first_stage_run_id)
+        mlflow.log_param("second_stage_run_id", second_stage_run_id)
+        mlflow.log_param("threshold", calibration['threshold'])
+        mlflow.log_param("target_accuracy", target_accuracy)
+        mlflow.set_tag("target_reached", str(calibration['target_reached']).lower())
+        
+        y_cascade_pred = cascade.predict(X_test)
+        cascade_acc, _, _, cascade_f1 = log_metrics(y_test, y_cascade_pred, "cascade_test_")
+        
+        # Per-row latency over the whole test batch, where the escalation mask pays off
+        cascade_batch_latency = measure_latency(cascade, X_test) / len(X_test)
+        second_batch_latency = measure_latency(second_stage, X_test) / len(X_test)
+        
+        # One row per call, the way /predict serves each model
+        def serve_second_stage(X):
+            second_stage.predict(X)
+            if hasattr(second_stage, "predict_proba"):
+                second_stage.predict_proba(X)
+        
+        cascade_row_latency = measure_row_latency(cascade.predict_with_proba, X_test)
+        second_row_latency = measure_row_latency(serve_second_stage, X_test)
+        
+        calibration.update({
+            'second_stage_test_accuracy': second_acc,
+            'cascade_test_accuracy': cascade_acc,
+            'cascade_test_f1_score': cascade_f1,
+            'cascade_batch_latency_ms_per_row': cascade_batch_latency,
+            'second_stage_batch_latency_ms_per_row': second_batch_latency,
+            'batch_latency_saved_pct': (1 - cascade_batch_latency / second_batch_latency) * 100,
+            'cascade_single_row_latency_ms': cascade_row_latency,
+            'second_stage_single_row_latency_ms': second_row_latency,
+            'single_row_latency_saved_pct': (1 - cascade_row_latency / second_row_latency) * 100,
+        })
+        mlflow.log_metrics({
+            key: calibration[key] for key in (
+                "escalation_fraction", "second_stage_test_accuracy",
+                "cascade_batch_latency_ms_per_row", "second_stage_batch_latency_ms_per_row",
+                "batch_latency_saved_pct", "cascade_single_row_latency_ms",
+                "second_stage_single_row_latency_ms", "single_row_latency_saved_pct",
+            )
+        })
+        mlflow.log_param("fast_first_stage", cascade.fast_first_stage)
+        
+        print(f"Cascade threshold: {calibration['threshold']:.4f} "
+              f"(target accuracy {target_accuracy:.4f}, reached: {calibration['target_reached']})")
+        print(f"Escalated: {calibration['escalation_fraction']:.1%} of rows, "
+              f"cascade accuracy: {cascade_acc:.4f}")
+        print(f"Batch latency per row: {cascade_batch_latency * 1000:.2f} us vs "
+              f"{second_batch_latency * 1000:.2f} us ({calibration['batch_latency_saved_pct']:.1f}% saved)")
+        print(f"Single-row latency: {cascade_row_latency * 1000:.2f} us vs "
+              f"{second_row_latency * 1000:.2f} us ({calibration['single_row_latency_saved_pct']:.1f}% saved)")
+        
+        record_active_run()
+        
+        return cascade, calibration
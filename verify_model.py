@@ -5,6 +5,8 @@ Simple verification script to test model loading and prediction.
 import mlflow
 import mlflow.sklearn
 import numpy as np
+from model_selection import select_best_run, LATENCY_SLO_MS, F1_TOLERANCE
+from run_store import RunStore, ensure_synced
 
 print("="*60)
 print("VERIFYING MLFLOW MODEL")
@@ -12,11 +14,10 @@ print("="*60)
 
 # Load the best model
 try:
-    experiment = mlflow.get_experiment_by_name("Classification_Experiments")
-    runs = mlflow.search_runs(experiment_ids=[experiment.experiment_id])
-    runs = runs.sort_values('metrics.test_f1_score', ascending=False)
-    
-    best_run = runs.iloc[0]
+    store = RunStore()
+    experiment_id = ensure_synced(store)
+    runs = store.selection_candidates(experiment_id, LATENCY_SLO_MS, F1_TOLERANCE)
+    best_run = select_best_run(runs)
     best_run_id = best_run['run_id']
     
     print(f"\nBest Run ID: {best_run_id}")